@@ -0,0 +1,188 @@
+import asyncio
+import re
+import time
+from typing import Any, Coroutine, List, Optional, Set, Tuple
+
+from google.genai import types
+from pydantic import BaseModel
+
+from client import client
+from config import (
+    ANALYSIS_CACHE_MAX_ENTRIES,
+    DOCUMENT_ANALYSIS_ENABLED,
+    GEMINI_MODEL,
+    SYSTEM_PROMPT_VERSION,
+)
+from context_cache import context_cache, prefix_contents
+from lru import BoundedLRU
+from metrics import record_generation
+from retries import call_with_retries
+from scheduler import generation_scheduler
+from sessions import session_store
+from singleflight import SingleFlight, join
+
+
+_ANALYSIS_INSTRUCTIONS = """Analyze the attached contract. Return:
+- summary: a plain-English summary of the agreement in at most five sentences.
+- obligations: the key obligations of each party, one short item each.
+- clauses: the critical clauses (termination, liability, payment, confidentiality, renewal and similar), one short item each.
+- risks: the main risks for the signing party, one short item each.
+Only describe what the document says; do not give legal advice."""
+
+
+class DocumentAnalysis(BaseModel):
+    summary: str
+    obligations: List[str]
+    clauses: List[str]
+    risks: List[str]
+
+
+AnalysisKey = Tuple[str, str]
+
+
+class AnalysisStore:
+    """Per-document analysis computed once at ingestion and shared by every
+    session on the same document."""
+
+    def __init__(self, max_entries: int, enabled: bool = True):
+        self._enabled = enabled
+        self._entries: BoundedLRU[AnalysisKey, dict] = BoundedLRU(max_entries)
+        self._analyses = SingleFlight()
+
+    def _key(self, document_hash: str) -> AnalysisKey:
+        return document_hash, SYSTEM_PROMPT_VERSION
+
+    def get(self, document_hash: Optional[str]) -> Optional[dict]:
+        if not document_hash:
+            return None
+        return self._entries.get(self._key(document_hash))
+
+    def ensure(self, session_id: Optional[str], document_hash: str, document_uri: str) -> None:
+        """Attach the document's analysis to the session, computing it in the background if needed.
+
+        With no session the analysis is only computed and cached, for documents
+        pre-warmed before anyone opens a chat.
+        """
+        if not self._enabled:
+            return
+
+        analysis = self.get(document_hash)
+        if analysis is not None:
+            if session_id is not None:
+                _spawn_attach(_attach(session_id, analysis))
+            return
+
+        key = self._key(document_hash)
+        task = self._analyses.start(key, lambda: self._analyze(key, document_hash, document_uri))
+        if session_id is not None:
+            _spawn_attach(_attach_when_done(session_id, task))
+
+    async def _analyze(self, key: AnalysisKey, document_hash: str, document_uri: str) -> Optional[dict]:
+        cache_name = context_cache.lookup(GEMINI_MODEL, document_hash, document_uri)
+        contents = [] if cache_name else prefix_contents(document_uri)
+        contents.append({"role": "user", "parts": [{"text": _ANALYSIS_INSTRUCTIONS}]})
+
+        async def attempt():
+            async with generation_scheduler.slot(f"analysis:{document_hash}"):
+                started = time.perf_counter()
+                response = await client.aio.models.generate_content(
+                    model=GEMINI_MODEL,
+                    contents=contents,
+                    config=types.GenerateContentConfig(
+                        cached_content=cache_name,
+                        response_mime_type="application/json",
+                        response_schema=DocumentAnalysis,
+                    )
+                )
+                return response, time.perf_counter() - started
+
+        try:
+            response, seconds = await call_with_retries("analysis", attempt)
+            # Shared by every session on the document, so only counted globally
+            record_generation("analysis", seconds, response.usage_metadata)
+            analysis = DocumentAnalysis.model_validate_json(response.text).model_dump()
+        except Exception as exc:
+            print(f"⚠️ Document analysis failed for {document_hash[:12]}: {exc}")
+            return None
+
+        self._entries.put(key, analysis)
+        return analysis
+
+
+# Analysis writes to the session store in flight, held until they finish
+_attaching: Set[asyncio.Task] = set()
+
+
+def _spawn_attach(write: Coroutine[Any, Any, None]) -> None:
+    task = asyncio.create_task(write)
+    _attaching.add(task)
+    task.add_done_callback(_attaching.discard)
+
+
+async def _attach(session_id: str, analysis: Optional[dict]) -> None:
+    if analysis is None:
+        return
+    try:
+        await session_store.call("set_analysis", session_id, analysis)
+    except KeyError:
+        pass
+
+
+async def _attach_when_done(session_id: str, task: asyncio.Task) -> None:
+    try:
+        analysis = await join(task)
+    except asyncio.CancelledError:
+        if not task.cancelled():
+            raise
+        return
+    await _attach(session_id, analysis)
+
+
+# Requests for a whole analysis section, matched against the entire prompt so
+# narrower questions ("the risks of early termination") go to the model
+_ASK = r"(please |can you |could you |tell me |show me |give me |list |what are )*"
+_DOCUMENT = r"(this|the) (contract|document|agreement)"
+_SCOPE = rf"( (in|of|under|from|for) {_DOCUMENT}| for me)*( please)?"
+_SECTION_PATTERNS = {
+    "summary": re.compile(
+        rf"{_ASK}((an? )?(short |brief |quick )?(summary|overview|tl;?dr)( of {_DOCUMENT})?|"
+        rf"summari[sz]e( {_DOCUMENT}| this| it)?|what is ({_DOCUMENT}|this|it) about){_SCOPE}"),
+    "obligations": re.compile(
+        rf"{_ASK}((my|our|the) )?(key |main )?(obligations|responsibilities|duties){_SCOPE}|"
+        rf"what (do|must) i (have to )?do{_SCOPE}"),
+    "clauses": re.compile(rf"{_ASK}(the )?(key|critical|important|main) (clauses|terms|provisions){_SCOPE}"),
+    "risks": re.compile(
+        rf"{_ASK}(are there )?(any |the )?(main |key |biggest )?(risks|red flags|concerns){_SCOPE}|"
+        rf"is {_DOCUMENT} risky"),
+}
+
+
+def answer_from_analysis(analysis: Optional[dict], prompt: str) -> Optional[str]:
+    """Return a reply built from the analysis when the prompt asks for one section as a whole."""
+    if not analysis:
+        return None
+    normalized = " ".join(prompt.strip().lower().rstrip("?.!").split())
+
+    sections = [name for name, pattern in _SECTION_PATTERNS.items() if pattern.fullmatch(normalized)]
+    if len(sections) != 1:
+        return None
+
+    section = sections[0]
+    if section == "summary":
+        return analysis["summary"]
+    items = analysis[section]
+    if not items:
+        return None
+    return "\n".join(f"- {item}" for item in items)
+
+
+def render_analysis(analysis: dict) -> str:
+    lines = [f"Summary: {analysis['summary']}"]
+    for title, section in (("Key obligations", "obligations"), ("Critical clauses", "clauses"), ("Risks", "risks")):
+        if analysis[section]:
+            lines.append(f"{title}:")
+            lines.extend(f"- {item}" for item in analysis[section])
+    return "\n".join(lines)
+
+
+analysis_store = AnalysisStore(max_entries=ANALYSIS_CACHE_MAX_ENTRIES, enabled=DOCUMENT_ANALYSIS_ENABLED)
@@ -0,0 +1,61 @@
+import re
+from typing import Optional, Tuple
+
+from config import ANSWER_CACHE_MAX_ENTRIES, SYSTEM_PROMPT_VERSION
+from lru import BoundedLRU
+from metrics import Counter, registry
+
+
+AnswerKey = Tuple[str, str, str, str]
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?.!]+$")
+
+
+def normalize_prompt(prompt: str) -> str:
+    # "Summarize this." and "  summarize   this?" are the same question
+    return _TRAILING_PUNCTUATION.sub("", _WHITESPACE.sub(" ", prompt.strip().lower()))
+
+
+class AnswerCache:
+    """Replies to the first question of a session, keyed by document hash,
+    system-prompt version, latency profile and normalized prompt.
+
+    Only first turns are cached: with no prior conversation the reply depends
+    on nothing but the key, so a hit is as correct as a fresh call. The
+    profile is part of the key because it changes thinking, length and
+    temperature.
+    """
+
+    def __init__(self, max_entries: int):
+        self._entries: BoundedLRU[AnswerKey, str] = BoundedLRU(max_entries)
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, document_hash: str, profile: str, prompt: str) -> AnswerKey:
+        return document_hash, SYSTEM_PROMPT_VERSION, profile, normalize_prompt(prompt)
+
+    def get(self, document_hash: Optional[str], profile: str, prompt: str) -> Optional[str]:
+        if not document_hash:
+            return None
+        reply = self._entries.get(self._key(document_hash, profile, prompt))
+        if reply is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return reply
+
+    def put(self, document_hash: Optional[str], profile: str, prompt: str, reply: str) -> None:
+        if not document_hash or not reply:
+            return
+        self._entries.put(self._key(document_hash, profile, prompt), reply)
+
+
+answer_cache = AnswerCache(max_entries=ANSWER_CACHE_MAX_ENTRIES)
+
+registry.register(Counter(
+    "ai_client_answer_cache_hits_total", "First-turn answers served from the cache.",
+    function=lambda: answer_cache.hits))
+registry.register(Counter(
+    "ai_client_answer_cache_misses_total", "First-turn answer cache lookups that missed.",
+    function=lambda: answer_cache.misses))
@@ -1,19 +1,93 @@
-import os
-import tempfile
+import asyncio
+import json
+import time
+from contextlib import aclosing, asynccontextmanager
 from typing import Optional
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Query
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 
-from sessions import session_store
-from documents import upload_document_for_session
-from chat import ask_gemini_for_session
+from config import DOCUMENT_MAX_BYTES, DOCUMENT_READY_TIMEOUT_SECONDS
+from metrics import MESSAGE_SECONDS, registry
+from profiles import LatencyProfile, resolve_profile
+from retries import DeadlineExceeded
+from scheduler import QueueFull, generation_scheduler
+from sessions import (
+    DOCUMENT_FAILED,
+    DOCUMENT_PENDING,
+    DOCUMENT_UPLOADING,
+    session_store,
+    session_usage,
+    sweep_expired_sessions,
+)
+from documents import (
+    attach_prewarmed_document,
+    document_handle_state,
+    prewarm_document,
+    start_document_ingestion,
+    wait_for_document,
+)
+from chat import ask_gemini_for_session, stream_gemini_for_session
+from channel import SessionChannel
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    sweeper = asyncio.create_task(sweep_expired_sessions(session_store))
+    yield
+    sweeper.cancel()
+    await session_store.call("hibernate_all")
+
+
+class UploadSizeLimit:
+    """Turn away upload bodies over DOCUMENT_MAX_BYTES before they are parsed.
+
+    Starlette spools the whole multipart body (to disk past 1 MB) before the
+    endpoint sees ``document.size``, so the limit is enforced on the raw body:
+    by Content-Length when given, otherwise as chunks arrive.
+    """
+
+    # Room for the multipart boundaries, part headers and form fields
+    _OVERHEAD = 64 * 1024
+
+    def __init__(self, app, paths: tuple, max_bytes: int):
+        self._app = app
+        self._paths = paths
+        self._max_bytes = max_bytes + self._OVERHEAD
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self._paths:
+            await self._app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self._max_bytes:
+            response = JSONResponse({"detail": "document_too_large"}, status_code=413)
+            await response(scope, receive, send)
+            return
 
+        received = 0
 
-app = FastAPI()
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self._max_bytes:
+                    # Raised inside form parsing; FastAPI answers it like one from the endpoint
+                    raise HTTPException(status_code=413, detail="document_too_large")
+            return message
+
+        await self._app(scope, limited_receive, send)
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Inside CORS, so rejections still carry its headers
+app.add_middleware(UploadSizeLimit, paths=("/documents", "/sessions/start"), max_bytes=DOCUMENT_MAX_BYTES)
 
 # Add CORS middleware to allow cross-origin requests
 app.add_middleware(
@@ -28,26 +102,91 @@ app.add_middleware(
 class MessageBody(BaseModel):
     session_id: str
     prompt: str
+    # fast, balanced or thorough; the server default when omitted
+    latency_profile: Optional[str] = None
 
 
 class EndBody(BaseModel):
     session_id: str
 
 
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _latency_profile(name: Optional[str]) -> LatencyProfile:
+    profile = resolve_profile(name)
+    if profile is None:
+        raise HTTPException(status_code=400, detail="unknown_latency_profile")
+    return profile
+
+
+def _overloaded(exc: QueueFull) -> HTTPException:
+    return HTTPException(status_code=429, detail="overloaded", headers={"Retry-After": str(exc.retry_after)})
+
+
+@app.post("/documents")
+async def create_document(document: UploadFile = File(...)):
+    """Ingest a document ahead of its first session, e.g. when the contract is created.
+
+    The handle returned is held in this worker's memory, so pre-warming needs
+    a single worker process: other workers answer 404 for it, or ingest the
+    file when /sessions/start sends one along.
+    """
+    if document.size is not None and document.size > DOCUMENT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="document_too_large")
+    try:
+        handle = await prewarm_document(document.file, document.filename or "document", document.content_type)
+    except ValueError:
+        raise HTTPException(status_code=413, detail="document_too_large")
+    return {"document_handle": handle, "document_state": document_handle_state(handle)}
+
+
+@app.get("/documents/{document_handle}")
+async def get_document(document_handle: str):
+    state = document_handle_state(document_handle)
+    if state is None:
+        raise HTTPException(status_code=404, detail="unknown_document_handle")
+    return {"document_handle": document_handle, "document_state": state}
+
+
 @app.post("/sessions/start")
-async def start_session(document: UploadFile = File(...)):
-    session_id = session_store.create()
+async def start_session(
+    document: Optional[UploadFile] = File(None),
+    document_handle: Optional[str] = Form(None),
+):
+    if not document_handle and document is None:
+        raise HTTPException(status_code=400, detail="missing_document")
+    if document is not None and document.size is not None and document.size > DOCUMENT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="document_too_large")
+    if document is None and document_handle_state(document_handle) is None:
+        # Nothing to fall back on: 404 so the client resends the file
+        raise HTTPException(status_code=404, detail="unknown_document_handle")
 
-    filename = document.filename or "document"
+    session_id = await session_store.call("create")
 
-    # Store to temp file (not persisted beyond request)
-    with tempfile.TemporaryDirectory() as tmpdir:
-        temp_path = os.path.join(tmpdir, filename)
-        with open(temp_path, "wb") as f:
-            f.write(await document.read())
-        uri = upload_document_for_session(session_id, temp_path)
+    # A known handle skips the upload; with an unknown one the file sent alongside is ingested
+    if not (document_handle and await attach_prewarmed_document(session_id, document_handle)):
+        if document is None:
+            # The handle lapsed since the check above
+            await session_store.call("end", session_id)
+            raise HTTPException(status_code=404, detail="unknown_document_handle")
 
-    return {"session_id": session_id, "document_uri": uri}
+        filename = document.filename or "document"
+
+        # Upload runs in the background; /sessions/poll reports when it is ready
+        try:
+            await start_document_ingestion(session_id, document.file, filename, document.content_type)
+        except ValueError:
+            await session_store.call("end", session_id)
+            raise HTTPException(status_code=413, detail="document_too_large")
+
+    session = await session_store.call("status", session_id)
+    return {
+        "session_id": session_id,
+        "document_uri": session.document_uri,
+        "document_state": session.document_state,
+    }
 
 
 @app.get("/sessions/poll")
@@ -55,29 +194,114 @@ async def poll_session(session_id: Optional[str] = Query(None)):
     if not session_id:
         raise HTTPException(status_code=400, detail="missing_session_id")
     try:
-        session_store.touch(session_id)
-        session = session_store.get(session_id)
-        return {"active": True, "has_document": bool(session.get("document_uri"))}
+        await session_store.call("touch", session_id)
+        session = await session_store.call("status", session_id)
+        return {
+            "active": True,
+            "has_document": bool(session.document_uri),
+            "document_state": session.document_state,
+            "document_error": session.document_error,
+            "usage": session_usage(session),
+        }
     except KeyError:
         return {"active": False}
 
 
+async def _require_document(session_id: str) -> None:
+    # Raises KeyError for unknown sessions, like the chat functions
+    state = await wait_for_document(session_id, DOCUMENT_READY_TIMEOUT_SECONDS)
+    if state in (DOCUMENT_PENDING, DOCUMENT_UPLOADING):
+        raise HTTPException(status_code=409, detail="document_not_ready")
+    if state == DOCUMENT_FAILED:
+        raise HTTPException(status_code=422, detail="document_ingestion_failed")
+
+
 @app.post("/sessions/message")
 async def post_message(body: MessageBody):
+    started = time.perf_counter()
+    profile = _latency_profile(body.latency_profile)
     try:
-        reply = ask_gemini_for_session(body.session_id, body.prompt)
+        await _require_document(body.session_id)
+        reply = await ask_gemini_for_session(body.session_id, body.prompt, profile)
         return {"reply": reply}
     except KeyError:
         raise HTTPException(status_code=410, detail="invalid_or_expired_session")
+    except QueueFull as exc:
+        raise _overloaded(exc)
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail="generation_timeout")
+    finally:
+        MESSAGE_SECONDS.observe(time.perf_counter() - started, endpoint="message")
+
+
+@app.post("/sessions/message/stream")
+async def post_message_stream(body: MessageBody):
+    started = time.perf_counter()
+    profile = _latency_profile(body.latency_profile)
+    try:
+        await _require_document(body.session_id)
+        # Turned away before the stream starts, while a status code can still be sent
+        generation_scheduler.check(body.session_id)
+    except KeyError:
+        raise HTTPException(status_code=410, detail="invalid_or_expired_session")
+    except QueueFull as exc:
+        raise _overloaded(exc)
+
+    async def events():
+        # Starlette cancels this generator when the client disconnects; the
+        # cancellation closes the upstream Gemini stream and no turns are recorded.
+        try:
+            async with aclosing(stream_gemini_for_session(body.session_id, body.prompt, profile)) as tokens:
+                try:
+                    async for text in tokens:
+                        yield _sse_event("token", {"text": text})
+                except KeyError:
+                    yield _sse_event("error", {"detail": "invalid_or_expired_session"})
+                    return
+                except QueueFull as exc:
+                    yield _sse_event("error", {"detail": "overloaded", "retry_after": exc.retry_after})
+                    return
+                except DeadlineExceeded:
+                    yield _sse_event("error", {"detail": "generation_timeout"})
+                    return
+                except Exception as exc:
+                    print(f"⚠️ Streamed reply failed for {body.session_id}: {exc!r}")
+                    yield _sse_event("error", {"detail": "generation_failed"})
+                    return
+            yield _sse_event("done", {})
+        finally:
+            MESSAGE_SECONDS.observe(time.perf_counter() - started, endpoint="stream")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post("/sessions/end")
 async def end_session(body: EndBody):
     if not body.session_id:
         raise HTTPException(status_code=400, detail="missing_session_id")
-    session_store.end(body.session_id)
+    await session_store.call("end", body.session_id)
     return {"ended": True}
 
 
+@app.websocket("/sessions/ws")
+async def session_socket(websocket: WebSocket):
+    # Start or attach, chat and end over one connection instead of poll plus POST
+    await SessionChannel(websocket).run()
+
+
+@app.get("/metrics")
+async def metrics():
+    # Store gauges query the backend, so blocking backends render off the event loop
+    if session_store.blocking:
+        text = await asyncio.to_thread(registry.render)
+    else:
+        text = registry.render()
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=False)
@@ -0,0 +1,214 @@
+"""Local stand-in for the google-genai client used by the benchmarks.
+
+Call ``install()`` before importing ``app``/``chat`` so every
+``from client import client`` picks up the fake instead of the real SDK.
+``fake_server.py`` serves the app over real sockets with one built from the
+``FAKE_GEMINI_*`` variables (see ``FakeClient.from_env``).
+
+Latencies are seconds or a distribution: ``uniform:LOW:HIGH`` or
+``lognormal:MEDIAN:SIGMA``.
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from collections import deque
+from types import SimpleNamespace
+from typing import Callable, Sequence, Union
+
+AI_CLIENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if AI_CLIENT_DIR not in sys.path:
+    sys.path.insert(0, AI_CLIENT_DIR)
+
+
+def _count_tokens(value) -> int:
+    # Same chars/4 rule as prompt.estimate_tokens
+    return len(json.dumps(value, default=str)) // 4 if value else 0
+
+
+def _usage(contents, text: str, cached: bool = False) -> SimpleNamespace:
+    prompt_tokens = _count_tokens(contents)
+    return SimpleNamespace(
+        prompt_token_count=prompt_tokens,
+        candidates_token_count=len(text) // 4,
+        thoughts_token_count=0,
+        cached_content_token_count=prompt_tokens if cached else 0,
+    )
+
+
+class FakeResponse:
+    def __init__(self, text: str, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class _Models:
+    def __init__(self, backend: "FakeClient"):
+        self._backend = backend
+
+    def generate_content(self, *, model, contents, config=None):
+        time.sleep(self._backend.next_latency())
+        return FakeResponse(self._backend.reply, _usage(contents, self._backend.reply))
+
+
+class _AsyncModels:
+    def __init__(self, backend: "FakeClient"):
+        self._backend = backend
+
+    async def generate_content(self, *, model, contents, config=None):
+        await asyncio.sleep(self._backend.next_latency())
+        cached = bool(getattr(config, "cached_content", None))
+        if getattr(config, "response_mime_type", None) == "application/json":
+            return FakeResponse(self._backend.json_reply, _usage(contents, self._backend.json_reply, cached))
+        return FakeResponse(self._backend.reply, _usage(contents, self._backend.reply, cached))
+
+    async def generate_content_stream(self, *, model, contents, config=None):
+        latency = self._backend.next_latency()
+        words = self._backend.reply.split(" ")
+        delay = latency / max(1, len(words))
+
+        usage = _usage(contents, self._backend.reply, bool(getattr(config, "cached_content", None)))
+
+        async def chunks():
+            for index, word in enumerate(words):
+                await asyncio.sleep(delay)
+                # Usage totals come with the last chunk
+                last = index == len(words) - 1
+                yield FakeResponse(word if index == 0 else " " + word, usage if last else None)
+
+        return chunks()
+
+
+class _Files:
+    def __init__(self, backend: "FakeClient"):
+        self._backend = backend
+
+    def upload(self, *, file, config=None):
+        time.sleep(self._backend.upload_latency())
+        return SimpleNamespace(uri=f"fake://files/{uuid.uuid4()}")
+
+
+class _AsyncFiles:
+    def __init__(self, backend: "FakeClient"):
+        self._backend = backend
+
+    async def upload(self, *, file, config=None):
+        # Drain the source in chunks the way the real resumable upload does
+        source = open(file, "rb") if isinstance(file, (str, os.PathLike)) else file
+        try:
+            while source.read(8 * 1024 * 1024):
+                await asyncio.sleep(0)
+        finally:
+            if source is not file:
+                source.close()
+        await asyncio.sleep(self._backend.upload_latency())
+        return SimpleNamespace(uri=f"fake://files/{uuid.uuid4()}", expiration_time=None)
+
+
+class _AsyncCaches:
+    async def create(self, *, model, config=None):
+        return SimpleNamespace(name=f"cachedContents/{uuid.uuid4()}")
+
+    async def update(self, *, name, config=None):
+        return SimpleNamespace(name=name)
+
+    async def delete(self, *, name, config=None):
+        return None
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    kind, _, args = spec.partition(":")
+    if not args:
+        value = float(spec)
+        return lambda: value
+    params = [float(arg) for arg in args.split(":")]
+    if kind == "uniform":
+        low, high = params
+        return lambda: random.uniform(low, high)
+    if kind == "lognormal":
+        median, sigma = params
+        return lambda: random.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"unknown latency distribution: {spec}")
+
+
+def _latency(value: Union[float, str, Callable[[], float]]) -> Callable[[], float]:
+    if callable(value):
+        return value
+    if isinstance(value, str):
+        return parse_latency(value)
+    return lambda: value
+
+
+class FakeClient:
+    def __init__(
+        self,
+        latency: Union[float, str, Callable[[], float]] = 1.0,
+        upload_latency: Union[float, str, Callable[[], float]] = 0.2,
+        reply: str = "ok",
+        error_rate: float = 0.0,
+        error_codes: Sequence[int] = (429, 503),
+    ):
+        self.latency = _latency(latency)
+        self.upload_latency = _latency(upload_latency)
+        self.reply = reply
+        # Share of model calls failing with one of error_codes, on top of the script
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        self.json_reply = json.dumps({
+            "summary": "Fake summary.",
+            "obligations": ["Fake obligation."],
+            "clauses": ["Fake clause."],
+            "risks": ["Fake risk."],
+        })
+        # Outcomes for the next async model calls: ("latency", seconds) or ("error", code)
+        self.script = deque()
+        self.model_calls = 0
+        self.models = _Models(self)
+        self.files = _Files(self)
+        self.aio = SimpleNamespace(models=_AsyncModels(self), files=_AsyncFiles(self), caches=_AsyncCaches())
+
+    @classmethod
+    def from_env(cls) -> "FakeClient":
+        words = int(os.getenv("FAKE_GEMINI_REPLY_WORDS") or 40)
+        return cls(
+            latency=os.getenv("FAKE_GEMINI_LATENCY") or "lognormal:1.0:0.4",
+            upload_latency=os.getenv("FAKE_GEMINI_UPLOAD_LATENCY") or "uniform:0.2:0.6",
+            reply=" ".join(["lorem"] * words),
+            error_rate=float(os.getenv("FAKE_GEMINI_ERROR_RATE") or 0.0),
+            error_codes=[int(code) for code in (os.getenv("FAKE_GEMINI_ERROR_CODES") or "429,503").split(",")],
+        )
+
+    def slow_next(self, seconds: float, times: int = 1) -> None:
+        self.script.extend([("latency", seconds)] * times)
+
+    def fail_next(self, code: int, times: int = 1) -> None:
+        self.script.extend([("error", code)] * times)
+
+    def next_latency(self) -> float:
+        """Latency for the next model call; raises the injected error when one is due."""
+        self.model_calls += 1
+        if self.script:
+            kind, value = self.script.popleft()
+        elif self.error_rate and random.random() < self.error_rate:
+            kind, value = "error", random.choice(self.error_codes)
+        else:
+            kind, value = "latency", self.latency()
+        if kind == "error":
+            from google.genai import errors
+
+            error_class = errors.ServerError if value >= 500 else errors.ClientError
+            raise error_class(value, {"error": {"code": value, "message": "injected by fake_gemini", "status": "FAKE"}})
+        return value
+
+
+def install(fake: FakeClient = None) -> FakeClient:
+    os.environ.setdefault("GEMINI_API_KEY", "fake")
+    import client as client_module
+
+    fake = fake or FakeClient()
+    client_module.client = fake
+    return fake
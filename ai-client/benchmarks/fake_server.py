@@ -0,0 +1,30 @@
+"""Serve the app with uvicorn against the fake Gemini backend.
+
+For load tests over real sockets (``load.py --base-url``, ``--websocket``).
+The fake is built from the ``FAKE_GEMINI_*`` variables and installed before
+the app is imported, so the production client never knows about it.
+
+    FAKE_GEMINI_LATENCY=lognormal:1.0:0.4 python benchmarks/fake_server.py --port 8000
+"""
+import argparse
+
+from fake_gemini import FakeClient, install
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    install(FakeClient.from_env())
+    import uvicorn
+
+    from app import app
+
+    print("⚠️ Model calls are simulated locally by benchmarks/fake_gemini.py")
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""Load generator replaying session lifecycles against ai-client.
+
+Each virtual user runs sessions back to back: start with a document, poll in
+the background the way the frontend does, send N messages (some streamed),
+then end. Reports throughput and p50/p95/p99 per endpoint.
+
+By default the app runs in-process against the fake Gemini backend. To load a
+real server, serve the app with the fake backend and point ``--base-url`` at it:
+
+    FAKE_GEMINI_LATENCY=lognormal:1.0:0.4 python benchmarks/fake_server.py --port 8000
+    python benchmarks/load.py --base-url http://localhost:8000 --concurrency 50 --sessions 500
+
+In-process streaming responses are buffered by the ASGI transport, so the
+"stream first token" row is only meaningful against a real server.
+
+``--websocket`` runs each session over ``/sessions/ws`` instead (real server
+only, needs the ``websockets`` package): one connection per session, no polls.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from fake_gemini import FakeClient, install
+
+# A mix of quick lookups and whole-document questions
+PROMPTS = [
+    "When does this agreement expire?",
+    "What is the notice period for termination?",
+    "Who are the parties to this contract?",
+    "How much is the monthly fee?",
+    "Is there an automatic renewal clause?",
+    "What are the main risks for me in this contract?",
+    "Summarize the payment obligations of both parties.",
+    "Explain the limitation of liability clause and its implications.",
+    "Compare the termination rights of each party.",
+    "What happens if an invoice is paid late?",
+]
+
+_CLAUSE = (
+    "{n}. {title}\n{n}.1 The Supplier shall perform the services described in Schedule {n} with due care and skill. "
+    "{n}.2 Either party may terminate this clause on thirty days written notice. "
+    "{n}.3 Fees under this clause are payable within thirty days of the invoice date.\n"
+)
+_TITLES = ["DEFINITIONS", "SERVICES", "FEES AND PAYMENT", "TERM AND TERMINATION", "CONFIDENTIALITY",
+           "LIABILITY", "INTELLECTUAL PROPERTY", "GOVERNING LAW"]
+
+
+def _document(index: int, clauses: int, shared: bool) -> bytes:
+    header = "MASTER SERVICES AGREEMENT\n" if shared else f"MASTER SERVICES AGREEMENT #{index}\n"
+    body = "".join(_CLAUSE.format(n=n + 1, title=_TITLES[n % len(_TITLES)]) for n in range(clauses))
+    return (header + body).encode()
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, started: float, status: int) -> None:
+        if status >= 400:
+            self.errors[endpoint][status] += 1
+        else:
+            self.latencies[endpoint].append(time.perf_counter() - started)
+
+    def report(self, elapsed: float, sessions: int, messages: int) -> None:
+        # First-token rows time part of another request
+        total = sum(len(samples) for name, samples in self.latencies.items() if "first token" not in name)
+        total += sum(sum(codes.values()) for codes in self.errors.values())
+        print(f"wall time: {elapsed:.2f}s   requests: {total} ({total / elapsed:.1f}/s)   "
+              f"sessions: {sessions} ({sessions / elapsed:.2f}/s)   messages: {messages} ({messages / elapsed:.2f}/s)")
+        print(f"{'endpoint':<22}{'ok':>7}{'errors':>18}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for endpoint in sorted(set(self.latencies) | set(self.errors)):
+            samples = self.latencies.get(endpoint) or [0.0]
+            errors = ",".join(f"{code}x{count}" for code, count in sorted(self.errors.get(endpoint, {}).items()))
+            print(f"{endpoint:<22}{len(self.latencies.get(endpoint, [])):>7}{errors or '-':>18}"
+                  f"{_percentile(samples, 50) * 1000:>10.1f}{_percentile(samples, 95) * 1000:>10.1f}"
+                  f"{_percentile(samples, 99) * 1000:>10.1f}{max(samples) * 1000:>10.1f}")
+
+
+async def _poll_loop(http, session_id: str, interval: float, recorder: Recorder, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await http.get("/sessions/poll", params={"session_id": session_id})
+        recorder.record("poll", started, response.status_code)
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _message(http, session_id: str, prompt: str, stream: bool, recorder: Recorder) -> None:
+    body = {"session_id": session_id, "prompt": prompt}
+    started = time.perf_counter()
+    if not stream:
+        response = await http.post("/sessions/message", json=body)
+        recorder.record("message", started, response.status_code)
+        return
+
+    async with http.stream("POST", "/sessions/message/stream", json=body) as response:
+        if response.status_code != 200:
+            recorder.record("stream", started, response.status_code)
+            return
+        first = True
+        failed = False
+        async for line in response.aiter_lines():
+            if first and line.startswith("event: token"):
+                recorder.record("stream first token", started, 200)
+                first = False
+            elif line.startswith("event: error"):
+                failed = True
+        recorder.record("stream", started, 599 if failed else 200)
+
+
+async def _session(http, index: int, args, recorder: Recorder) -> int:
+    document = _document(index, args.clauses, args.shared_document)
+    started = time.perf_counter()
+    response = await http.post("/sessions/start", files={"document": ("contract.txt", document, "text/plain")})
+    recorder.record("start", started, response.status_code)
+    if response.status_code != 200:
+        return 0
+    session_id = response.json()["session_id"]
+
+    stop = asyncio.Event()
+    poller = asyncio.create_task(_poll_loop(http, session_id, args.poll_interval, recorder, stop))
+    sent = 0
+    try:
+        for _ in range(args.messages):
+            await asyncio.sleep(random.uniform(0, 2 * args.think_time))
+            await _message(http, session_id, random.choice(PROMPTS), random.random() < args.stream_ratio, recorder)
+            sent += 1
+    finally:
+        stop.set()
+        await poller
+
+    started = time.perf_counter()
+    response = await http.post("/sessions/end", json={"session_id": session_id})
+    recorder.record("end", started, response.status_code)
+    return sent
+
+
+async def _ws_session(index: int, args, recorder: Recorder) -> int:
+    import websockets
+
+    url = args.base_url.replace("http", "ws", 1).rstrip("/") + "/sessions/ws"
+    started = time.perf_counter()
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({"type": "start", "filename": "contract.txt", "mime_type": "text/plain"}))
+        await ws.send(_document(index, args.clauses, args.shared_document))
+        frame = json.loads(await ws.recv())
+        recorder.record("ws start", started, 200 if frame["type"] == "session" else 599)
+        if frame["type"] != "session":
+            return 0
+
+        sent = 0
+        for number in range(args.messages):
+            await asyncio.sleep(random.uniform(0, 2 * args.think_time))
+            await ws.send(json.dumps({"type": "message", "id": number, "prompt": random.choice(PROMPTS)}))
+            started = time.perf_counter()
+            first = True
+            while True:
+                frame = json.loads(await ws.recv())
+                if frame.get("id") != number:
+                    # Document updates pushed by the server
+                    continue
+                if frame["type"] == "token" and first:
+                    recorder.record("ws first token", started, 200)
+                    first = False
+                elif frame["type"] in ("done", "error"):
+                    recorder.record("ws message", started, 200 if frame["type"] == "done" else 599)
+                    break
+            sent += 1
+
+        started = time.perf_counter()
+        await ws.send(json.dumps({"type": "end"}))
+        while json.loads(await ws.recv())["type"] != "ended":
+            pass
+        recorder.record("ws end", started, 200)
+    return sent
+
+
+async def run(args) -> None:
+    import httpx
+
+    if args.websocket and not args.base_url:
+        raise SystemExit("--websocket needs --base-url")
+
+    if args.base_url:
+        transport: Optional[httpx.AsyncBaseTransport] = None
+        base_url = args.base_url
+    else:
+        install(FakeClient(latency=args.latency, upload_latency=args.upload_latency,
+                           reply=" ".join(["lorem"] * args.reply_words), error_rate=args.error_rate))
+        from app import app
+
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://load"
+
+    recorder = Recorder()
+    remaining = iter(range(args.sessions))
+    totals = {"sessions": 0, "messages": 0}
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout, limits=limits) as http:
+        async def user() -> None:
+            for index in remaining:
+                if args.websocket:
+                    sent = await _ws_session(index, args, recorder)
+                else:
+                    sent = await _session(http, index, args, recorder)
+                totals["messages"] += sent
+                totals["sessions"] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    recorder.report(elapsed, totals["sessions"], totals["messages"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", help="load a running server instead of the in-process app")
+    parser.add_argument("--websocket", action="store_true", help="run sessions over /sessions/ws")
+    parser.add_argument("--concurrency", type=int, default=20, help="virtual users")
+    parser.add_argument("--sessions", type=int, default=100, help="sessions in total")
+    parser.add_argument("--messages", type=int, default=5, help="messages per session")
+    parser.add_argument("--stream-ratio", type=float, default=0.5)
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean seconds between messages")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--clauses", type=int, default=40, help="clauses in each synthetic document")
+    parser.add_argument("--shared-document", action="store_true", help="every session uploads the same bytes")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    # In-process fake backend
+    parser.add_argument("--latency", default="lognormal:1.0:0.4")
+    parser.add_argument("--upload-latency", default="uniform:0.2:0.6")
+    parser.add_argument("--reply-words", type=int, default=40)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Measures /sessions/poll latency while /sessions/message calls are in flight.
+
+Runs the app in-process against the fake Gemini backend, so any blocking call on
+the event loop shows up directly as poll latency. Requires ``httpx``.
+
+    python benchmarks/poll_latency.py --messages 32 --latency 2.0
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from fake_gemini import FakeClient, install
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(messages: int, latency: float, poll_interval: float) -> None:
+    install(FakeClient(latency=latency))
+
+    import httpx
+    from app import app
+    from sessions import session_store
+
+    session_ids = [session_store.create() for _ in range(messages + 1)]
+    poller_id = session_ids.pop()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        async def send(session_id):
+            await http.post("/sessions/message", json={"session_id": session_id, "prompt": "Summarize"})
+
+        started = time.perf_counter()
+        senders = asyncio.gather(*(send(sid) for sid in session_ids))
+
+        samples = []
+        while not senders.done():
+            t0 = time.perf_counter()
+            await http.get("/sessions/poll", params={"session_id": poller_id})
+            samples.append(time.perf_counter() - t0)
+            await asyncio.sleep(poll_interval)
+        await senders
+        elapsed = time.perf_counter() - started
+
+    print(f"messages in flight: {messages}, model latency: {latency:.2f}s, wall time: {elapsed:.2f}s")
+    print(f"poll samples: {len(samples)}")
+    print(f"poll p50: {statistics.median(samples) * 1000:.2f} ms")
+    print(f"poll p99: {_percentile(samples, 99) * 1000:.2f} ms")
+    print(f"poll max: {max(samples) * 1000:.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=2.0)
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(run(args.messages, args.latency, args.poll_interval))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Hit rate, mistakes and latency of the local off-topic / legal-advice pre-filter.
+
+Screens a small labelled set of prompts at each threshold and reports how
+many clear-cut prompts are answered locally, how many on-topic prompts would
+wrongly get a canned reply, and the classifier's own latency. Then sends one
+canned and one regular prompt through the app against the fake backend.
+
+    python benchmarks/prefilter.py --thresholds 2 3 4
+"""
+import argparse
+import asyncio
+import os
+import time
+
+# Read by config at import time
+os.environ.setdefault("DOCUMENT_ANALYSIS_ENABLED", "0")
+
+from fake_gemini import FakeClient, install
+
+fake = install(FakeClient(latency=0.8, upload_latency=0.01))
+
+from prefilter import LEGAL_ADVICE, OFF_TOPIC, screen_prompt  # noqa: E402
+
+PROMPTS = {
+    OFF_TOPIC: [
+        "What's the weather like in London tomorrow?",
+        "Tell me a joke",
+        "Write me a python script that reverses a string",
+        "Who won the world cup in 2018?",
+        "What is the capital of Australia?",
+        "Give me a recipe for banana bread",
+        "How old are you?",
+        "what is 17 * 23",
+        "Can you help me debug my javascript?",
+        "Recommend a good movie for tonight",
+        "Write a poem about the sea",
+        "What's the bitcoin price today?",
+    ],
+    LEGAL_ADVICE: [
+        "Should I sign this contract?",
+        "Is this agreement legally binding?",
+        "Can I sue them if they pay late?",
+        "Do I need a lawyer for this?",
+        "Will I win if I take them to court?",
+        "Should we walk away from this deal?",
+        "Is it legal for them to terminate without notice?",
+    ],
+    None: [
+        "When does this agreement expire?",
+        "What is the notice period for termination?",
+        "Who are the parties to this contract?",
+        "How much is the monthly fee?",
+        "Summarize the payment obligations of both parties.",
+        "Explain the limitation of liability clause.",
+        "What does the contract say about court jurisdiction?",
+        "Are legal fees recoverable under section 9?",
+        "Must we accept delivery within 10 days?",
+        "What happens if I breach the confidentiality clause?",
+        "Can you write a short summary of this document?",
+        "How is the contract verified on the blockchain?",
+        "What are the main risks for me?",
+        "Is there an automatic renewal clause?",
+        "Which law governs this agreement?",
+        "Can I file a claim for damages under the warranty?",
+        "4.2",
+        "30",
+        "x",
+        "What does clause 9 say about enforceability?",
+        "Is the arbitration clause enforceable?",
+        "Is the non-compete clause enforceable?",
+        "How many vacation days do I get?",
+        "How much holiday leave am I entitled to?",
+        "Who owns the python code we deliver?",
+        "Who owns the rights to the film?",
+        "What are the royalties for each song?",
+        "Which SQL database must the vendor use?",
+        "Do we have to debug the software within 30 days?",
+        "Can we sue for breach under section 9?",
+        "Is it illegal to share the NDA?",
+    ],
+}
+
+
+def _screen_all(threshold: int) -> None:
+    hits = mistakes = 0
+    total = sum(len(prompts) for prompts in PROMPTS.values())
+    timings = []
+    for expected, prompts in PROMPTS.items():
+        for prompt in prompts:
+            started = time.perf_counter()
+            got = screen_prompt(prompt, threshold=threshold)
+            timings.append(time.perf_counter() - started)
+            if got is not None and got == expected:
+                hits += 1
+            elif got is not None:
+                mistakes += 1
+    clear_cut = total - len(PROMPTS[None])
+    timings.sort()
+    print(f"{threshold:>9}{hits:>6}/{clear_cut:<4}{mistakes:>10}{hits / total:>10.0%}"
+          f"{timings[len(timings) // 2] * 1e6:>10.1f}{timings[int(len(timings) * 0.99)] * 1e6:>10.1f}")
+
+
+async def _through_app() -> None:
+    import httpx
+
+    from app import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://prefilter", timeout=30) as http:
+        response = await http.post("/sessions/start", files={"document": ("c.txt", b"contract", "text/plain")})
+        session_id = response.json()["session_id"]
+        await http.get("/sessions/poll", params={"session_id": session_id})
+        for prompt in ("Tell me a joke", "When does this agreement expire?"):
+            fake.model_calls = 0
+            started = time.perf_counter()
+            response = await http.post("/sessions/message", json={"session_id": session_id, "prompt": prompt})
+            elapsed = time.perf_counter() - started
+            print(f"  {prompt!r:<38} {elapsed * 1000:8.1f} ms   model calls: {fake.model_calls}   "
+                  f"{response.json()['reply'][:48]!r}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--thresholds", type=int, nargs="+", default=[1, 2, 3, 4, 6])
+    args = parser.parse_args()
+
+    print(f"{'threshold':>9}{'hits':>11}{'mistakes':>10}{'hit rate':>10}{'p50 us':>10}{'p99 us':>10}")
+    for threshold in args.thresholds:
+        _screen_all(threshold)
+    print("through the app (fake model latency 0.8 s):")
+    asyncio.run(_through_app())
+
+
+if __name__ == "__main__":
+    main()
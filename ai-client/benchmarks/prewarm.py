@@ -0,0 +1,82 @@
+"""Chat opening latency with and without pre-warmed documents.
+
+For each contract, the "file" row starts a session with the document and waits
+for it to become ready, then asks a first question; the "handle" row sends the
+document to /documents when the contract is created and later starts the
+session with the returned handle. Runs in-process against the fake backend,
+whose upload latency stands in for the provider upload.
+
+    python benchmarks/prewarm.py --contracts 50 --upload-latency uniform:1:3
+"""
+import argparse
+import asyncio
+import os
+import time
+
+# Read by config at import time
+os.environ.setdefault("DOCUMENT_ANALYSIS_ENABLED", "0")
+
+from fake_gemini import FakeClient, install
+from load import _document, _percentile
+
+
+async def _open_chat(http, start_kwargs) -> tuple:
+    started = time.perf_counter()
+    session_id = (await http.post("/sessions/start", **start_kwargs)).json()["session_id"]
+    while (await http.get("/sessions/poll", params={"session_id": session_id})).json()["document_state"] != "ready":
+        await asyncio.sleep(0.02)
+    ready = time.perf_counter() - started
+    response = await http.post("/sessions/message", json={"session_id": session_id, "prompt": "Who are the parties?"})
+    assert response.status_code == 200, response.text
+    return ready, time.perf_counter() - started
+
+
+async def run(args) -> None:
+    import httpx
+
+    install(FakeClient(latency=args.latency, upload_latency=args.upload_latency))
+    from app import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://prewarm", timeout=120) as http:
+        # Distinct documents per row, so the upload cache does not help the second one
+        files = [
+            {"files": {"document": ("contract.txt", _document(index, args.clauses, False), "text/plain")}}
+            for index in range(args.contracts)
+        ]
+        file_results = await asyncio.gather(*(_open_chat(http, kwargs) for kwargs in files))
+
+        handles = []
+        for index in range(args.contracts, 2 * args.contracts):
+            document = _document(index, args.clauses, False)
+            response = await http.post("/documents", files={"document": ("contract.txt", document, "text/plain")})
+            handles.append(response.json()["document_handle"])
+        # The recipient opens the chat well after the contract was created
+        for handle in handles:
+            while (await http.get(f"/documents/{handle}")).json()["document_state"] != "ready":
+                await asyncio.sleep(0.05)
+        handle_results = await asyncio.gather(
+            *(_open_chat(http, {"data": {"document_handle": handle}}) for handle in handles)
+        )
+
+    print(f"{args.contracts} contracts, upload latency {args.upload_latency}, model latency {args.latency}")
+    print(f"{'start with':<12}{'ready p50 ms':>14}{'ready p95 ms':>14}{'reply p50 ms':>14}{'reply p95 ms':>14}")
+    for name, results in (("file", file_results), ("handle", handle_results)):
+        ready = [result[0] for result in results]
+        reply = [result[1] for result in results]
+        print(f"{name:<12}{_percentile(ready, 50) * 1000:>14.1f}{_percentile(ready, 95) * 1000:>14.1f}"
+              f"{_percentile(reply, 50) * 1000:>14.1f}{_percentile(reply, 95) * 1000:>14.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--contracts", type=int, default=50)
+    parser.add_argument("--clauses", type=int, default=40)
+    parser.add_argument("--latency", default="lognormal:1.0:0.4")
+    parser.add_argument("--upload-latency", default="uniform:1:3")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Retry, deadline and hedging scenarios against the fake Gemini backend.
+
+Each scenario injects errors or latency into the fake, sends messages through
+the app and checks that the reply arrives (or fails) as expected, that the
+session records exactly one exchange per successful message and that usage
+counts one model call per reply.
+
+    python benchmarks/resilience.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+# Read by config at import time
+os.environ.setdefault("GEMINI_DEADLINE_SECONDS", "2")
+os.environ.setdefault("GEMINI_RETRY_BASE_MS", "50")
+os.environ.setdefault("GEMINI_HEDGE_ENABLED", "1")
+os.environ.setdefault("DOCUMENT_ANALYSIS_ENABLED", "0")
+
+from fake_gemini import FakeClient, install
+
+fake = install(FakeClient(latency=0.05, upload_latency=0.01, reply="The notice period is thirty days."))
+
+import httpx  # noqa: E402
+
+from app import app  # noqa: E402
+from sessions import session_store  # noqa: E402
+
+
+async def _start(client: httpx.AsyncClient, name: str) -> str:
+    response = await client.post("/sessions/start", files={"document": (f"{name}.txt", name.encode(), "text/plain")})
+    session_id = response.json()["session_id"]
+    await client.get("/sessions/poll", params={"session_id": session_id})
+    return session_id
+
+
+async def _send(client: httpx.AsyncClient, session_id: str, prompt: str, stream: bool = False):
+    path = "/sessions/message/stream" if stream else "/sessions/message"
+    started = time.perf_counter()
+    response = await client.post(path, json={"session_id": session_id, "prompt": prompt})
+    return response, time.perf_counter() - started
+
+
+def _report(name: str, ok: bool, detail: str) -> bool:
+    print(f"{'PASS' if ok else 'FAIL'}  {name:<28} {detail}")
+    return ok
+
+
+async def main() -> int:
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://fake", timeout=30) as client:
+        # Two 503s, then success: one reply, one exchange, three provider calls
+        session_id = await _start(client, "retry")
+        fake.model_calls = 0
+        fake.fail_next(503, times=2)
+        response, elapsed = await _send(client, session_id, "What is the notice period?")
+        session = session_store.get(session_id)
+        results.append(_report(
+            "retry after 503",
+            response.status_code == 200 and len(session.conversation) == 2
+            and session.model_calls == 1 and fake.model_calls == 3,
+            f"status={response.status_code} turns={len(session.conversation)} "
+            f"provider_calls={fake.model_calls} {elapsed:.2f}s",
+        ))
+
+        # A 400 is not retried on the same tier, but falls back to the other one
+        fake.model_calls = 0
+        fake.fail_next(400)
+        response, _ = await _send(client, session_id, "When does the agreement expire?")
+        session = session_store.get(session_id)
+        results.append(_report(
+            "400 falls back to other tier",
+            response.status_code == 200 and fake.model_calls == 2 and len(session.conversation) == 4
+            and session.model_calls == 2,
+            f"status={response.status_code} provider_calls={fake.model_calls} turns={len(session.conversation)}",
+        ))
+
+        # Slower than the deadline: 504 and nothing recorded
+        fake.slow_next(5.0)
+        response, elapsed = await _send(client, session_id, "Who pays the invoices?")
+        session = session_store.get(session_id)
+        results.append(_report(
+            "deadline",
+            response.status_code == 504 and len(session.conversation) == 4 and elapsed < 3,
+            f"status={response.status_code} turns={len(session.conversation)} {elapsed:.2f}s",
+        ))
+
+        # Warm the latency tracker, then one slow call gets hedged
+        for index in range(25):
+            await _send(client, await _start(client, f"warm-{index}"), f"Warm-up question {index}?")
+        session_id = await _start(client, "hedge")
+        fake.model_calls = 0
+        fake.slow_next(1.5)
+        response, elapsed = await _send(client, session_id, "What happens on termination?")
+        session = session_store.get(session_id)
+        results.append(_report(
+            "hedge beats slow call",
+            response.status_code == 200 and elapsed < 1.0 and len(session.conversation) == 2
+            and session.model_calls == 1 and fake.model_calls == 2,
+            f"status={response.status_code} turns={len(session.conversation)} "
+            f"provider_calls={fake.model_calls} {elapsed:.2f}s",
+        ))
+
+        # Stream that fails to open once
+        session_id = await _start(client, "stream")
+        fake.fail_next(429)
+        response, elapsed = await _send(client, session_id, "Summarize the payment terms.", stream=True)
+        session = session_store.get(session_id)
+        results.append(_report(
+            "stream retry after 429",
+            "event: done" in response.text and len(session.conversation) == 2,
+            f"status={response.status_code} turns={len(session.conversation)} {elapsed:.2f}s",
+        ))
+
+        metrics = (await client.get("/metrics")).text
+        for line in metrics.splitlines():
+            if line.startswith(("ai_client_retries", "ai_client_hedge", "ai_client_deadlines", "ai_client_tier_fallbacks")):
+                print(f"      {line}")
+
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
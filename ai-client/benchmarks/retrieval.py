@@ -0,0 +1,140 @@
+"""Prompt size and latency of retrieval mode against whole-file mode.
+
+For each contract, reports the estimated input tokens when the whole text is
+attached versus only the top-k retrieved passages, the local index build and
+query time, and whether the passages contain the clause each question is about.
+Without ``--corpus`` a set of synthetic master agreements is generated. With
+``--live`` both prompts are also sent to Gemini (needs GEMINI_API_KEY).
+
+    python benchmarks/retrieval.py --corpus ./contracts --top-k 6
+"""
+import argparse
+import asyncio
+import mimetypes
+import os
+import random
+import statistics
+import time
+
+import fake_gemini
+from retrieval import BM25Index, extract_text, split_clauses
+
+# (question, heading of the clause that answers it)
+QUESTIONS = [
+    ("How can either party terminate this agreement?", "TERMINATION"),
+    ("When are invoices due and what are the payment terms?", "FEES AND PAYMENT"),
+    ("Who owns the intellectual property created under the agreement?", "INTELLECTUAL PROPERTY"),
+    ("What is the cap on liability?", "LIMITATION OF LIABILITY"),
+    ("How long do the confidentiality obligations last?", "CONFIDENTIALITY"),
+    ("Which law governs the agreement and where are disputes resolved?", "GOVERNING LAW"),
+]
+
+_SECTIONS = {
+    "DEFINITIONS": "capitalized terms have the meanings given in this section and in each statement of work",
+    "SERVICES": "the supplier shall perform the services described in each statement of work with due skill and care",
+    "FEES AND PAYMENT": "the customer shall pay each invoice within thirty days of receipt and late payments accrue interest",
+    "CONFIDENTIALITY": "each party shall keep the other party's confidential information secret for five years after disclosure",
+    "INTELLECTUAL PROPERTY": "all intellectual property in the deliverables vests in the customer on payment in full",
+    "WARRANTIES": "the supplier warrants that the services will conform to the specification for ninety days",
+    "INDEMNITIES": "the supplier shall indemnify the customer against third party infringement claims",
+    "LIMITATION OF LIABILITY": "each party's total liability is capped at the fees paid in the twelve months before the claim",
+    "TERMINATION": "either party may terminate for convenience on ninety days written notice or immediately for material breach",
+    "DATA PROTECTION": "the supplier shall process personal data only on documented instructions from the customer",
+    "GOVERNING LAW": "this agreement is governed by the laws of England and disputes are resolved in the courts of London",
+    "GENERAL": "this agreement is the entire agreement between the parties and may only be amended in writing",
+}
+_FILLER = (
+    "The parties acknowledge that the obligations in this clause apply to any affiliate, subcontractor or "
+    "permitted assignee, and that any notice under this clause must be given in accordance with the notices "
+    "provision. Nothing in this clause limits any other right or remedy available under this agreement."
+)
+
+
+def synthetic_contract(seed: int, subclauses: int) -> str:
+    rng = random.Random(seed)
+    lines = ["MASTER SERVICES AGREEMENT"]
+    for number, (heading, core) in enumerate(_SECTIONS.items(), start=1):
+        lines.append(f"{number}. {heading}")
+        core_at = rng.randrange(subclauses)
+        for sub in range(1, subclauses + 1):
+            text = core.capitalize() + ". " + _FILLER if sub - 1 == core_at else _FILLER
+            lines.append(f"{number}.{sub} {text}")
+    return "\n".join(lines)
+
+
+def load_corpus(path: str):
+    for name in sorted(os.listdir(path)):
+        full_path = os.path.join(path, name)
+        mime_type = mimetypes.guess_type(name)[0] or "text/plain"
+        with open(full_path, "rb") as f:
+            text = extract_text(f, mime_type)
+        if text:
+            yield name, text
+
+
+async def _live_latency(text: str) -> float:
+    from client import client
+    from config import GEMINI_MODEL, system_prompt
+
+    started = time.perf_counter()
+    await client.aio.models.generate_content(
+        model=GEMINI_MODEL,
+        contents=[{"role": "user", "parts": [{"text": system_prompt}, {"text": text}]}],
+    )
+    return time.perf_counter() - started
+
+
+def bench(name: str, text: str, top_k: int, live: bool) -> None:
+    from prompt import estimate_tokens
+
+    started = time.perf_counter()
+    index = BM25Index(split_clauses(text))
+    build_ms = (time.perf_counter() - started) * 1000
+
+    whole_tokens = estimate_tokens(text)
+    passage_tokens, query_ms, found = [], [], 0
+    whole_latency, passage_latency = [], []
+    for question, heading in QUESTIONS:
+        started = time.perf_counter()
+        hits = index.search(question, top_k)
+        query_ms.append((time.perf_counter() - started) * 1000)
+
+        passages = "\n\n".join(index.chunks[hit] for hit in hits)
+        passage_tokens.append(estimate_tokens(passages))
+        found += _SECTIONS.get(heading, heading).lower()[:40] in passages.lower()
+
+        if live:
+            whole_latency.append(asyncio.run(_live_latency(f"{text}\n\n{question}")))
+            passage_latency.append(asyncio.run(_live_latency(f"{passages}\n\n{question}")))
+
+    print(f"{name}: {len(index.chunks)} chunks, index build {build_ms:.1f} ms, "
+          f"query p50 {statistics.median(query_ms):.2f} ms")
+    print(f"  input tokens  whole file: {whole_tokens:>7}   retrieval: {statistics.mean(passage_tokens):>7.0f}"
+          f"   ({statistics.mean(passage_tokens) / whole_tokens:.1%})")
+    print(f"  answering clause retrieved: {found}/{len(QUESTIONS)}")
+    if live:
+        print(f"  model latency p50  whole file: {statistics.median(whole_latency):.2f} s"
+              f"   retrieval: {statistics.median(passage_latency):.2f} s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="directory of .txt or .pdf contracts")
+    parser.add_argument("--contracts", type=int, default=3, help="synthetic contracts when no corpus is given")
+    parser.add_argument("--subclauses", type=int, default=40)
+    parser.add_argument("--top-k", type=int, default=6)
+    parser.add_argument("--live", action="store_true")
+    args = parser.parse_args()
+    if not args.live:
+        fake_gemini.install()
+
+    if args.corpus:
+        documents = list(load_corpus(args.corpus))
+    else:
+        documents = [(f"synthetic-{seed}", synthetic_contract(seed, args.subclauses)) for seed in range(args.contracts)]
+    for name, text in documents:
+        bench(name, text, args.top_k, args.live)
+
+
+if __name__ == "__main__":
+    main()
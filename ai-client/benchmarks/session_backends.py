@@ -0,0 +1,126 @@
+"""Contract checks for the shared session backends against local stand-ins.
+
+Runs the same lifecycle against SQLiteSessionStore on a temporary file and
+RedisSessionStore on fakeredis: create, fields, turns, usage, touch, end and
+expiry. It also runs two stores on the same database, standing in for two
+worker processes, appending to one session at once through ``call``. Needs
+``fakeredis`` (requirements-dev.txt).
+
+    python benchmarks/session_backends.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import fake_gemini  # noqa: F401  (puts ai-client on sys.path)
+from sessions import DOCUMENT_READY, RedisSessionStore, SQLiteSessionStore, SessionStore
+
+_APPENDS = 40
+_TTL_SECONDS = 1
+
+
+def _report(backend: str, name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'PASS' if ok else 'FAIL'}  {backend:<8} {name:<28} {detail}")
+    return ok
+
+
+def _raises_key_error(call) -> bool:
+    try:
+        call()
+    except KeyError:
+        return True
+    return False
+
+
+async def _check(backend: str, store: SessionStore, peer: SessionStore) -> list:
+    results = []
+
+    session_id = await store.call("create")
+    session = await store.call("get", session_id)
+    results.append(_report(backend, "create", session.conversation == [] and session.document_uri is None))
+
+    await store.call("set_document_ready", session_id, "files/abc", "hash")
+    await store.call("append_user_turn", session_id, "When does it expire?")
+    await store.call("append_model_turn", session_id, "On 1 May.")
+    await store.call("add_usage", session_id, {"input_tokens": 10, "output_tokens": 3, "model_calls": 1})
+    await store.call("add_usage", session_id, {"input_tokens": 5, "model_calls": 1})
+    session = await peer.call("get", session_id)
+    results.append(_report(
+        backend, "fields, turns and usage",
+        session.document_state == DOCUMENT_READY
+        and [turn.role for turn in session.conversation] == ["user", "model"]
+        and session.conversation_bytes == len("When does it expire?") + len("On 1 May.")
+        and session.input_tokens == 15 and session.model_calls == 2,
+        f"turns={len(session.conversation)} bytes={session.conversation_bytes} calls={session.model_calls}",
+    ))
+
+    # Two workers appending to the same session at the same time
+    shared_id = await store.call("create")
+    await asyncio.gather(*(
+        (store if number % 2 else peer).call("append_user_turn", shared_id, f"turn {number:03d}")
+        for number in range(_APPENDS)
+    ))
+    session = await store.call("get", shared_id)
+    texts = sorted(turn.text for turn in session.conversation)
+    results.append(_report(
+        backend, "concurrent appenders",
+        texts == [f"turn {number:03d}" for number in range(_APPENDS)]
+        and session.conversation_bytes == sum(len(text) for text in texts),
+        f"turns={len(session.conversation)}/{_APPENDS} bytes={session.conversation_bytes}",
+    ))
+
+    results.append(_report(
+        backend, "unknown session",
+        _raises_key_error(lambda: store.get("missing")) and _raises_key_error(lambda: store.touch("missing"))
+        and _raises_key_error(lambda: store.append_user_turn("missing", "hi")),
+    ))
+
+    await store.call("end", session_id)
+    results.append(_report(backend, "end", _raises_key_error(lambda: peer.get(session_id))))
+
+    # Both stores use a 1 s TTL; a touched session outlives an untouched one
+    idle_id = await store.call("create")
+    kept_id = await store.call("create")
+    time.sleep(_TTL_SECONDS * 0.6)
+    await peer.call("touch", kept_id)
+    time.sleep(_TTL_SECONDS * 0.6)
+    await store.call("purge_expired")
+    results.append(_report(
+        backend, "expiry and touch",
+        _raises_key_error(lambda: store.get(idle_id)) and not _raises_key_error(lambda: store.get(kept_id)),
+    ))
+    return results
+
+
+def _short_ttl(*stores: SessionStore) -> None:
+    for store in stores:
+        store._ttl = lambda: _TTL_SECONDS
+
+
+async def main() -> int:
+    results = []
+
+    directory = tempfile.mkdtemp(prefix="session-backends-")
+    path = os.path.join(directory, "sessions.db")
+    store, peer = SQLiteSessionStore(path), SQLiteSessionStore(path)
+    _short_ttl(store, peer)
+    results += await _check("sqlite", store, peer)
+
+    try:
+        import fakeredis
+    except ImportError:
+        print("SKIP  redis    needs the 'fakeredis' package")
+    else:
+        server = fakeredis.FakeServer()
+        store = RedisSessionStore(client=fakeredis.FakeRedis(server=server))
+        peer = RedisSessionStore(client=fakeredis.FakeRedis(server=server))
+        _short_ttl(store, peer)
+        results += await _check("redis", store, peer)
+
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,120 @@
+"""Resident memory of the in-memory SessionStore with and without hibernation.
+
+Builds ``--sessions`` sessions of ``--turns`` turns each, in batches the way
+traffic would arrive. With hibernation, the clock moves past the idle
+threshold after every batch, so sessions from earlier batches go to
+snapshots. Each mode runs in its own process so RSS figures do not mix. Also
+reports snapshot size on disk and how long ``get`` takes to load one back.
+
+    python benchmarks/session_hibernation.py --sessions 10000 --turns 20
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import fake_gemini  # noqa: F401  (puts ai-client on sys.path)
+from sessions import MemorySessionStore
+
+_WORDS = ("the supplier shall pay notice termination clause agreement party fees invoice liability "
+          "confidential renewal period thirty days services schedule obligations warranty").split()
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def _run(args, hibernate: bool) -> dict:
+    rng = random.Random(7)
+    snapshot_dir = tempfile.mkdtemp(prefix="session-snapshots-")
+    # Unbounded, so only hibernation changes what stays in memory
+    store = MemorySessionStore(max_sessions=0, max_turns=0, max_conversation_bytes=0,
+                               hibernate_after=60 if hibernate else 0, snapshot_dir=snapshot_dir)
+    clock = [time.time()]
+    store._now = lambda: clock[0]
+    # Sessions stay alive however long the run takes
+    store._ttl = lambda: 10 ** 9
+
+    rss_before = _rss_bytes()
+    tracemalloc.start()
+    session_ids = []
+    started = time.perf_counter()
+    for number in range(args.sessions):
+        session_id = store.create()
+        session_ids.append(session_id)
+        for _ in range(args.turns // 2):
+            store.append_user_turn(session_id, _text(rng, rng.randint(8, 25)))
+            store.append_model_turn(session_id, _text(rng, rng.randint(40, 160)))
+        if (number + 1) % args.batch == 0:
+            clock[0] += 61
+            store.hibernate_idle()
+    build_seconds = time.perf_counter() - started
+    heap, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = _rss_bytes()
+
+    load_ms = []
+    for session_id in rng.sample(session_ids, min(1000, len(session_ids))):
+        started = time.perf_counter()
+        store.get(session_id)
+        load_ms.append((time.perf_counter() - started) * 1000)
+    load_ms.sort()
+
+    disk = sum(entry.stat().st_size for entry in os.scandir(snapshot_dir))
+    stats = store.stats()
+    shutil.rmtree(snapshot_dir)
+    return {
+        "heap_mb": heap / 1e6,
+        "rss_mb": (rss_after - rss_before) / 1e6,
+        "build_s": build_seconds,
+        "resident": stats["live_sessions"] - stats["hibernated_sessions"],
+        "conversation_mb": stats["conversation_bytes"] / 1e6,
+        "disk_mb": disk / 1e6,
+        "get_p50_ms": load_ms[len(load_ms) // 2],
+        "get_p99_ms": load_ms[int(len(load_ms) * 0.99)],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=500, help="sessions created between hibernation sweeps")
+    parser.add_argument("--mode", choices=("off", "on"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(_run(args, args.mode == "on")))
+        return
+
+    print(f"{args.sessions} sessions x {args.turns} turns")
+    print(f"{'hibernation':<13}{'heap MB':>9}{'RSS MB':>9}{'resident':>10}{'conv MB':>9}{'disk MB':>9}"
+          f"{'build s':>9}{'get p50 ms':>12}{'get p99 ms':>12}")
+    for mode in ("off", "on"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--sessions", str(args.sessions),
+             "--turns", str(args.turns), "--batch", str(args.batch)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:<13}{result['heap_mb']:>9.1f}{result['rss_mb']:>9.1f}{result['resident']:>10}"
+              f"{result['conversation_mb']:>9.1f}{result['disk_mb']:>9.1f}{result['build_s']:>9.2f}"
+              f"{result['get_p50_ms']:>12.3f}{result['get_p99_ms']:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Bytes held per session and per turn by the in-memory SessionStore.
+
+The "dicts" rows rebuild the previous layout, where each session was a plain
+dict and each turn a ``{"role", "parts": [{"text"}]}`` dict; the "records"
+rows use MemorySessionStore itself. Turn text is shared across turns so only
+the per-turn container overhead is measured.
+
+The "flood" row then writes ten times more sessions and turns than a bounded
+store allows, with distinct text per turn, and reports what the store still
+holds after evicting and trimming.
+
+    python benchmarks/session_memory.py --sessions 10000 --turns 20
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+import uuid
+from collections import OrderedDict
+
+import fake_gemini  # noqa: F401  (puts ai-client on sys.path)
+from sessions import SESSIONS_EVICTED, TURNS_TRIMMED, MemorySessionStore, _SESSION_FIELDS
+
+_TEXT = "What is the notice period for termination under this agreement?"
+
+
+def _dict_layout(sessions: int, turns: int) -> OrderedDict:
+    store = OrderedDict()
+    for _ in range(sessions):
+        session = dict(_SESSION_FIELDS)
+        session.update({"conversation": [], "last_seen": time.time(), "active": True})
+        for index in range(turns):
+            role = "user" if index % 2 == 0 else "model"
+            session["conversation"].append({"role": role, "parts": [{"text": _TEXT}]})
+        store[str(uuid.uuid4())] = session
+    return store
+
+
+def _record_layout(sessions: int, turns: int) -> MemorySessionStore:
+    store = MemorySessionStore(max_sessions=0, max_turns=0, max_conversation_bytes=0)
+    for _ in range(sessions):
+        session_id = store.create()
+        for index in range(turns):
+            store._append_turn(session_id, "user" if index % 2 == 0 else "model", _TEXT)
+    return store
+
+
+def _measure(build, sessions: int, turns: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    held = build(sessions, turns)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return size
+
+
+def _flood(args) -> None:
+    store = MemorySessionStore(
+        max_sessions=args.max_sessions, max_turns=args.max_turns, max_conversation_bytes=args.max_bytes
+    )
+    gc.collect()
+    tracemalloc.start()
+    for number in range(args.max_sessions * 10):
+        session_id = store.create()
+        for index in range(args.max_turns * 10 if number % 100 == 0 else args.turns):
+            text = f"{number}:{index} " + "x" * args.turn_bytes
+            store._append_turn(session_id, "user" if index % 2 == 0 else "model", text)
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = store.stats()
+    print(f"{'flood':>8}  held: {size / 1e6:.1f} MB (peak {peak / 1e6:.1f} MB)   "
+          f"sessions: {stats['live_sessions']}   conversation: {stats['conversation_bytes'] / 1e6:.1f} MB")
+    for line in SESSIONS_EVICTED.samples() + TURNS_TRIMMED.samples():
+        print(f"          {line}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=20)
+    # Bounds for the flood run
+    parser.add_argument("--max-sessions", type=int, default=1000)
+    parser.add_argument("--max-turns", type=int, default=40)
+    parser.add_argument("--max-bytes", type=int, default=8 * 1024 * 1024)
+    parser.add_argument("--turn-bytes", type=int, default=1024)
+    args = parser.parse_args()
+
+    for name, build in (("dicts", _dict_layout), ("records", _record_layout)):
+        empty = _measure(build, args.sessions, 0)
+        full = _measure(build, args.sessions, args.turns)
+        per_session = empty / args.sessions
+        per_turn = (full - empty) / (args.sessions * args.turns) if args.turns else 0.0
+        print(f"{name:>8}  per session: {per_session:7.0f} B   per turn: {per_turn:6.0f} B")
+    _flood(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Microbenchmark of the per-poll SessionStore cost against live session count.
+
+A poll is ``touch`` followed by ``get``. The "full scan" column times the old
+behaviour, where every ``get`` walked all sessions looking for expired ones.
+
+    python benchmarks/session_poll.py --sizes 100 1000 10000 100000
+"""
+import argparse
+import random
+import time
+
+import fake_gemini  # noqa: F401  (puts ai-client on sys.path)
+from sessions import MemorySessionStore
+
+
+def _full_scan(store: MemorySessionStore) -> None:
+    now = store._now()
+    for sess in store._sessions.values():
+        if now - sess.last_seen > store._ttl():
+            pass
+
+
+def bench(size: int, polls: int) -> None:
+    store = MemorySessionStore()
+    session_ids = [store.create() for _ in range(size)]
+    targets = [random.choice(session_ids) for _ in range(polls)]
+
+    started = time.perf_counter()
+    for sid in targets:
+        store.touch(sid)
+        store.get(sid)
+    per_poll = (time.perf_counter() - started) / polls
+
+    scans = max(1, min(polls, 2_000_000 // size))
+    started = time.perf_counter()
+    for _ in range(scans):
+        _full_scan(store)
+        _full_scan(store)
+    per_scan_poll = (time.perf_counter() - started) / scans
+
+    print(f"{size:>8} sessions  poll: {per_poll * 1e6:8.2f} us   full scan: {per_scan_poll * 1e6:10.2f} us")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--polls", type=int, default=100000)
+    args = parser.parse_args()
+    for size in args.sizes:
+        bench(size, args.polls)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Peak RSS and latency of /sessions/start for large documents.
+
+Each size runs against a fresh uvicorn process backed by the fake Gemini
+client, and the server's peak RSS (VmHWM, Linux only) is read after the
+upload. Requires ``httpx``.
+
+    python benchmarks/upload_memory.py --sizes-mb 1 20 100
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_SERVER = """
+import fake_gemini
+fake_gemini.install(fake_gemini.FakeClient(upload_latency=0.0))
+import uvicorn
+uvicorn.run("app:app", host="127.0.0.1", port={port}, log_level="warning")
+"""
+
+
+def _peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def _wait_ready(base_url: str, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{base_url}/sessions/poll", params={"session_id": "x"}, timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def bench(size_mb: int, port: int) -> None:
+    env = dict(os.environ, DOCUMENT_MAX_BYTES=str((size_mb + 1) * 1024 * 1024))
+    server = subprocess.Popen(
+        [sys.executable, "-c", _SERVER.format(port=port)], cwd=BENCH_DIR, env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(base_url)
+        idle_rss = _peak_rss_mb(server.pid)
+
+        with tempfile.TemporaryFile() as document:
+            chunk = os.urandom(1024 * 1024)
+            for _ in range(size_mb):
+                document.write(chunk)
+            document.seek(0)
+
+            started = time.perf_counter()
+            response = httpx.post(
+                f"{base_url}/sessions/start",
+                files={"document": ("contract.pdf", document, "application/pdf")},
+                timeout=300.0,
+            )
+            elapsed = time.perf_counter() - started
+        response.raise_for_status()
+
+        peak_rss = _peak_rss_mb(server.pid)
+        print(f"{size_mb:>5} MB  start: {elapsed * 1000:9.1f} ms   peak RSS: {peak_rss:7.1f} MB"
+              f"   (+{peak_rss - idle_rss:.1f} MB over idle)")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[1, 20, 100])
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    for size_mb in args.sizes_mb:
+        bench(size_mb, args.port)
+
+
+if __name__ == "__main__":
+    main()
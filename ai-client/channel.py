@@ -0,0 +1,200 @@
+import asyncio
+import io
+import json
+import time
+from contextlib import aclosing
+from typing import Any, Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from chat import stream_gemini_for_session
+from config import DOCUMENT_MAX_BYTES, DOCUMENT_READY_TIMEOUT_SECONDS
+from documents import (
+    attach_prewarmed_document,
+    document_handle_state,
+    start_document_ingestion,
+    wait_for_document,
+)
+from metrics import MESSAGE_SECONDS
+from profiles import LatencyProfile, resolve_profile
+from retries import DeadlineExceeded
+from scheduler import QueueFull, generation_scheduler
+from sessions import DOCUMENT_FAILED, DOCUMENT_PENDING, DOCUMENT_UPLOADING, session_store
+
+
+class SessionChannel:
+    """One WebSocket carrying a whole session.
+
+    Client frames are JSON objects:
+
+    - ``{"type": "start", "filename": ..., "mime_type": ...}`` followed by one
+      binary frame with the document, ``{"type": "start", "document_handle": ...}``
+      for a document sent to /documents beforehand, or
+      ``{"type": "attach", "session_id": ...}`` for a session started over HTTP
+    - ``{"type": "message", "id": ..., "prompt": ...}``, one at a time, with an
+      optional ``latency_profile`` (fast, balanced or thorough)
+    - ``{"type": "end"}``
+
+    The server answers with ``session``, ``document`` (once ingestion settles),
+    ``token``/``done``/``error`` per message and ``ended``. While the socket is
+    open the session store keeps the session alive, so no polling is needed.
+
+    A document frame is held in memory whole, so it is bounded by the server's
+    WebSocket frame limit (uvicorn ``--ws-max-size``, 16 MiB by default) as well
+    as DOCUMENT_MAX_BYTES; larger documents go through /documents and a handle.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self._ws = websocket
+        self._send_lock = asyncio.Lock()
+        self._session_id: Optional[str] = None
+        self._reply: Optional[asyncio.Task] = None
+        self._watcher: Optional[asyncio.Task] = None
+
+    async def _send(self, frame: Dict[str, Any]) -> None:
+        # Replies and document updates come from different tasks
+        async with self._send_lock:
+            await self._ws.send_text(json.dumps(frame))
+
+    async def _error(self, detail: str, **extra: Any) -> None:
+        await self._send({"type": "error", "detail": detail, **extra})
+
+    async def run(self) -> None:
+        await self._ws.accept()
+        try:
+            while True:
+                try:
+                    frame = json.loads(await self._ws.receive_text())
+                    kind = frame.get("type")
+                except (ValueError, AttributeError, KeyError):
+                    await self._error("bad_request")
+                    continue
+
+                if kind == "end":
+                    await self._end()
+                    return
+                if kind == "message":
+                    await self._message(frame)
+                elif kind in ("start", "attach"):
+                    await self._open(kind, frame)
+                else:
+                    await self._error("bad_request")
+        except WebSocketDisconnect:
+            pass
+        finally:
+            # A reply still streaming is cancelled and records no turns, as with SSE
+            for task in (self._reply, self._watcher):
+                if task is not None:
+                    task.cancel()
+            if self._session_id is not None:
+                await session_store.disconnect(self._session_id)
+
+    async def _open(self, kind: str, frame: Dict[str, Any]) -> None:
+        if self._session_id is not None:
+            await self._error("session_already_open")
+            return
+
+        if kind == "attach":
+            session_id = frame.get("session_id")
+            try:
+                await session_store.connect(session_id)
+            except KeyError:
+                await self._error("invalid_or_expired_session")
+                return
+        elif frame.get("document_handle"):
+            if document_handle_state(frame["document_handle"]) is None:
+                await self._error("unknown_document_handle")
+                return
+            session_id = await session_store.call("create")
+            await attach_prewarmed_document(session_id, frame["document_handle"])
+            await session_store.connect(session_id)
+        else:
+            message = await self._ws.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            document = message.get("bytes")
+            if document is None:
+                # A text frame where the document should be
+                await self._error("bad_request")
+                return
+            if len(document) > DOCUMENT_MAX_BYTES:
+                await self._error("document_too_large")
+                return
+            session_id = await session_store.call("create")
+            try:
+                await start_document_ingestion(
+                    session_id, io.BytesIO(document), frame.get("filename") or "document", frame.get("mime_type")
+                )
+            except ValueError:
+                await session_store.call("end", session_id)
+                await self._error("document_too_large")
+                return
+            await session_store.connect(session_id)
+
+        self._session_id = session_id
+        state = (await session_store.call("status", session_id)).document_state
+        await self._send({"type": "session", "session_id": session_id, "document_state": state})
+        if state in (DOCUMENT_PENDING, DOCUMENT_UPLOADING):
+            self._watcher = asyncio.create_task(self._watch_document(session_id))
+
+    async def _watch_document(self, session_id: str) -> None:
+        try:
+            state = DOCUMENT_PENDING
+            while state in (DOCUMENT_PENDING, DOCUMENT_UPLOADING):
+                state = await wait_for_document(session_id, DOCUMENT_READY_TIMEOUT_SECONDS)
+            session = await session_store.call("status", session_id)
+            await self._send({"type": "document", "state": state, "error": session.document_error})
+        except (KeyError, WebSocketDisconnect):
+            pass
+
+    async def _message(self, frame: Dict[str, Any]) -> None:
+        message_id = frame.get("id")
+        if self._session_id is None:
+            await self._error("no_session", id=message_id)
+        elif self._reply is not None and not self._reply.done():
+            await self._error("busy", id=message_id)
+        elif (profile := resolve_profile(frame.get("latency_profile"))) is None:
+            await self._error("unknown_latency_profile", id=message_id)
+        else:
+            prompt = frame.get("prompt") or ""
+            self._reply = asyncio.create_task(self._stream_reply(self._session_id, message_id, prompt, profile))
+
+    async def _stream_reply(self, session_id: str, message_id: Any, prompt: str, profile: LatencyProfile) -> None:
+        started = time.perf_counter()
+        try:
+            state = await wait_for_document(session_id, DOCUMENT_READY_TIMEOUT_SECONDS)
+            if state in (DOCUMENT_PENDING, DOCUMENT_UPLOADING):
+                await self._error("document_not_ready", id=message_id)
+                return
+            if state == DOCUMENT_FAILED:
+                await self._error("document_ingestion_failed", id=message_id)
+                return
+            generation_scheduler.check(session_id)
+
+            async with aclosing(stream_gemini_for_session(session_id, prompt, profile)) as tokens:
+                async for text in tokens:
+                    await self._send({"type": "token", "id": message_id, "text": text})
+            await self._send({"type": "done", "id": message_id})
+        except KeyError:
+            await self._error("invalid_or_expired_session", id=message_id)
+        except QueueFull as exc:
+            await self._error("overloaded", id=message_id, retry_after=exc.retry_after)
+        except DeadlineExceeded:
+            await self._error("generation_timeout", id=message_id)
+        except WebSocketDisconnect:
+            pass
+        except Exception as exc:
+            print(f"⚠️ WebSocket reply failed for {session_id}: {exc!r}")
+            await self._error("generation_failed", id=message_id)
+        finally:
+            MESSAGE_SECONDS.observe(time.perf_counter() - started, endpoint="websocket")
+
+    async def _end(self) -> None:
+        if self._reply is not None:
+            self._reply.cancel()
+        if self._session_id is not None:
+            await session_store.disconnect(self._session_id)
+            await session_store.call("end", self._session_id)
+            self._session_id = None
+        await self._send({"type": "ended"})
+        await self._ws.close()
@@ -1,13 +1,59 @@
+import asyncio
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, Optional
+
+from google.genai import types
+
 from client import client
-from config import system_prompt
+from config import system_prompt, GEMINI_DEADLINE_SECONDS, GEMINI_HEDGE_ENABLED, GEMINI_MODEL
+from analysis import analysis_store, answer_from_analysis
+from answer_cache import answer_cache
+from metrics import FIRST_TOKEN_SECONDS, record_generation
+from prefilter import CANNED_REPLIES, SCREENED, screen_prompt
+from profiles import (
+    DEFAULT_PROFILE,
+    PROFILE_OUTPUT_TOKENS,
+    PROFILE_SECONDS,
+    PROFILE_TRUNCATED,
+    LatencyProfile,
+    hit_output_limit,
+)
+from prompt import build_session_request
+from retries import DEADLINES_EXCEEDED, DeadlineExceeded, LatencyTracker, call_with_retries
+from routing import (
+    DEEP_TIER,
+    FALLBACKS,
+    FAST_TIER,
+    ROUTED,
+    TIER_SECONDS,
+    ModelTier,
+    classify_prompt,
+    fallback_tier,
+)
+from scheduler import QueueFull, generation_scheduler
+from singleflight import generation_flight, request_key
 import state
 from sessions import session_store
 
 
+def _screened_reply(prompt: str) -> Optional[str]:
+    # Clear-cut off-topic or legal-advice prompts get the reply the rules
+    # prescribe, without a model call
+    category = screen_prompt(prompt)
+    SCREENED.inc(result=category or "model")
+    return None if category is None else CANNED_REPLIES[category]
+
+
 def ask_gemini(prompt: str):
     # Add user turn
     state.conversation.append({"role": "user", "parts": [{"text": prompt}]})
 
+    canned = _screened_reply(prompt)
+    if canned is not None:
+        state.conversation.append({"role": "model", "parts": [{"text": canned}]})
+        return canned
+
     # Build request
     contents = [{"role": "user", "parts": [{"text": system_prompt}]}]
 
@@ -25,9 +71,11 @@ def ask_gemini(prompt: str):
     contents.extend(state.conversation)
 
     # Call Gemini
+    tier = classify_prompt(prompt)
     response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=contents
+        model=tier.model,
+        contents=contents,
+        config=tier.apply(None)
     )
 
     # Append model reply
@@ -36,38 +84,266 @@ def ask_gemini(prompt: str):
     return response.text
 
 
-def ask_gemini_for_session(session_id: str, prompt: str) -> str:
-    session = session_store.get(session_id)
+_SUMMARY_INSTRUCTIONS = """Condense the conversation below between a user and the Contract Lock assistant into a short running summary.
+Keep every fact about the contract, each question the user asked and the key points of each answer. Use plain sentences, no headings.
+"""
 
-    # Add user turn
-    session_store.append_user_turn(session_id, prompt)
+# Recent chat call latencies per tier, for the hedge delay
+_tier_latency = {FAST_TIER.name: LatencyTracker(), DEEP_TIER.name: LatencyTracker()}
 
-    # Build request
-    contents = [{"role": "user", "parts": [{"text": system_prompt}]}]
+# Background summarization jobs, one per session at most
+_summary_tasks: Dict[str, asyncio.Task] = {}
 
-    # Always include document reference
-    if session.get("document_uri"):
-        contents.append({
-            "role": "user",
-            "parts": [
-                {"file_data": {"file_uri": session["document_uri"]}},
-                {"text": "Reference document attached for context."}
-            ]
-        })
 
-    # Add the whole conversation
-    contents.extend(session["conversation"])
+def _schedule_summary(session_id: str, session, fold_upto: int) -> None:
+    if not fold_upto or session_id in _summary_tasks:
+        return
+    start = session.summary_turns or 0
+    turns = session.conversation[start:fold_upto]
+    task = asyncio.create_task(_summarize(session_id, session.summary, turns, fold_upto, session.trimmed_turns or 0))
+    _summary_tasks[session_id] = task
+    task.add_done_callback(lambda _: _summary_tasks.pop(session_id, None))
 
-    # Call Gemini
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=contents
-    )
 
-    # Append model reply
-    session_store.append_model_turn(session_id, response.text)
+async def _summarize(session_id: str, previous: Optional[str], turns: list, fold_upto: int, trimmed: int) -> None:
+    transcript = "\n".join(f"{turn.role}: {turn.text}" for turn in turns if turn.text)
+    text = _SUMMARY_INSTRUCTIONS
+    if previous:
+        text += f"\nExisting summary:\n{previous}\n"
+    text += f"\nConversation:\n{transcript}"
+
+    async def attempt():
+        async with generation_scheduler.slot(f"summary:{session_id}"):
+            started = time.perf_counter()
+            response = await client.aio.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=[{"role": "user", "parts": [{"text": text}]}],
+                config=types.GenerateContentConfig(thinking_config=types.ThinkingConfig(thinking_budget=0))
+            )
+            return response, time.perf_counter() - started
+
+    try:
+        response, seconds = await call_with_retries("summary", attempt)
+        usage = record_generation("summary", seconds, response.usage_metadata)
+        # Turns trimmed by the store meanwhile shift the fold index
+        trimmed = ((await session_store.call("status", session_id)).trimmed_turns or 0) - trimmed
+        await session_store.call("set_summary", session_id, response.text, max(0, fold_upto - trimmed))
+        await session_store.call("add_usage", session_id, usage)
+    except Exception as exc:
+        # Session ended or the call failed; the next turn schedules it again
+        print(f"⚠️ Conversation summary failed for {session_id}: {exc}")
+
+
+def _is_first_turn(session) -> bool:
+    return not session.conversation and not session.summary
+
+
+def _first_turn_reply(session, prompt: str, profile: LatencyProfile) -> Optional[str]:
+    # Opening questions repeat across sessions on the same document
+    cached = answer_cache.get(session.document_hash, profile.name, prompt)
+    if cached is not None:
+        return cached
+    analysis = session.analysis or analysis_store.get(session.document_hash)
+    return answer_from_analysis(analysis, prompt)
+
 
-    # Touch to keep alive
-    session_store.touch(session_id)
+async def _record_exchange(session_id: str, prompt: str, reply: str) -> None:
+    await session_store.call("append_user_turn", session_id, prompt)
+    await session_store.call("append_model_turn", session_id, reply)
+    await session_store.call("touch", session_id)
+
+
+def _record_profile(profile: LatencyProfile, seconds: float, usage: Optional[Dict[str, float]], truncated: bool) -> None:
+    PROFILE_SECONDS.observe(seconds, profile=profile.name)
+    if usage is not None:
+        PROFILE_OUTPUT_TOKENS.inc(usage["output_tokens"], profile=profile.name)
+    if truncated:
+        PROFILE_TRUNCATED.inc(profile=profile.name)
+
+
+async def ask_gemini_for_session(session_id: str, prompt: str, profile: LatencyProfile = DEFAULT_PROFILE) -> str:
+    session = await session_store.call("get", session_id)
+
+    canned = _screened_reply(prompt)
+    if canned is not None:
+        await _record_exchange(session_id, prompt, canned)
+        return canned
+
+    first_turn = _is_first_turn(session)
+    if first_turn:
+        cached = _first_turn_reply(session, prompt, profile)
+        if cached is not None:
+            await _record_exchange(session_id, prompt, cached)
+            return cached
+
+    tier = classify_prompt(prompt)
+    ROUTED.inc(tier=tier.name)
+    started = time.perf_counter()
+    # One deadline for the message, shared with a fallback tier
+    deadline = time.monotonic() + GEMINI_DEADLINE_SECONDS
+    try:
+        response, usage, first_in_session, fold_upto = await _generate_on_tier(
+            session_id, session, prompt, tier, profile, deadline
+        )
+    except (QueueFull, DeadlineExceeded):
+        raise
+    except Exception as exc:
+        fallback = fallback_tier(tier)
+        if fallback is None:
+            raise
+        print(f"⚠️ Gemini {tier.name} tier failed ({exc}), falling back to {fallback.name}")
+        FALLBACKS.inc(tier=fallback.name)
+        response, usage, first_in_session, fold_upto = await _generate_on_tier(
+            session_id, session, prompt, fallback, profile, deadline
+        )
+
+    truncated = hit_output_limit(response)
+    _record_profile(profile, time.perf_counter() - started, usage if first_in_session else None, truncated)
+    # Turns are recorded after the call, once per session, so a duplicate
+    # request neither changes the payload nor records a second exchange
+    if first_in_session:
+        await _record_exchange(session_id, prompt, response.text)
+        await session_store.call("add_usage", session_id, usage)
+        _schedule_summary(session_id, session, fold_upto)
+        # A reply cut short by a fast profile is not the answer to share
+        if first_turn and not truncated:
+            answer_cache.put(session.document_hash, profile.name, prompt, response.text)
+    else:
+        await session_store.call("touch", session_id)
 
     return response.text
+
+
+async def _generate_on_tier(
+    session_id: str, session, prompt: str, tier: ModelTier, profile: LatencyProfile, deadline: float
+):
+    # Built per tier: a provider cache only serves the model it was created for
+    contents, config, fold_upto = build_session_request(session, pending_prompt=prompt, model=tier.model)
+    config = profile.apply(config, tier)
+
+    async def attempt():
+        async with generation_scheduler.slot(session_id):
+            started = time.perf_counter()
+            response = await client.aio.models.generate_content(
+                model=tier.model,
+                contents=contents,
+                config=config
+            )
+            return response, time.perf_counter() - started
+
+    async def generate():
+        # Only the copy that wins is accounted for; the turns are recorded once by the caller
+        started = time.perf_counter()
+        response, seconds = await call_with_retries(
+            "chat",
+            attempt,
+            deadline_seconds=deadline - time.monotonic(),
+            tracker=_tier_latency[tier.name],
+            hedge_when=generation_scheduler.has_idle_slot if GEMINI_HEDGE_ENABLED else None,
+        )
+        TIER_SECONDS.observe(time.perf_counter() - started, tier=tier.name)
+        return response, record_generation("chat", seconds, response.usage_metadata)
+
+    # Identical requests in flight (double sends, retries, the same opening
+    # question on a shared cache) share one Gemini call
+    (response, usage), first_in_session = await generation_flight.do(
+        request_key(tier.model, contents, config), generate, member=session_id
+    )
+    return response, usage, first_in_session, fold_upto
+
+
+async def _next_chunk(stream, deadline: float):
+    try:
+        return await asyncio.wait_for(anext(stream, None), max(0.0, deadline - time.monotonic()))
+    except asyncio.TimeoutError:
+        DEADLINES_EXCEEDED.inc(call="stream")
+        raise DeadlineExceeded(f"stream exceeded its {GEMINI_DEADLINE_SECONDS}s deadline") from None
+
+
+async def _open_stream_on_tier(session, prompt: str, tier: ModelTier, profile: LatencyProfile, deadline: float):
+    contents, config, fold_upto = build_session_request(session, pending_prompt=prompt, model=tier.model)
+    config = profile.apply(config, tier)
+
+    async def open_stream():
+        # Retried until the first chunk arrives; once text reaches the user it is not
+        stream = await client.aio.models.generate_content_stream(
+            model=tier.model,
+            contents=contents,
+            config=config
+        )
+        try:
+            return stream, await anext(stream, None)
+        except BaseException:
+            await stream.aclose()
+            raise
+
+    stream, chunk = await call_with_retries("stream", open_stream, deadline_seconds=deadline - time.monotonic())
+    return stream, chunk, fold_upto
+
+
+async def stream_gemini_for_session(
+    session_id: str, prompt: str, profile: LatencyProfile = DEFAULT_PROFILE
+) -> AsyncIterator[str]:
+    requested = time.perf_counter()
+    session = await session_store.call("get", session_id)
+
+    canned = _screened_reply(prompt)
+    if canned is not None:
+        await _record_exchange(session_id, prompt, canned)
+        yield canned
+        return
+
+    first_turn = _is_first_turn(session)
+    if first_turn:
+        cached = _first_turn_reply(session, prompt, profile)
+        if cached is not None:
+            await _record_exchange(session_id, prompt, cached)
+            yield cached
+            return
+
+    # Both turns are recorded only after the stream completes, so a client
+    # that disconnects mid-reply leaves the conversation unchanged.
+    tier = classify_prompt(prompt)
+    ROUTED.inc(tier=tier.name)
+
+    chunks = []
+    usage_metadata = None
+    truncated = False
+    deadline = time.monotonic() + GEMINI_DEADLINE_SECONDS
+    async with generation_scheduler.slot(session_id):
+        started = time.perf_counter()
+        try:
+            stream, chunk, fold_upto = await _open_stream_on_tier(session, prompt, tier, profile, deadline)
+        except DeadlineExceeded:
+            raise
+        except Exception as exc:
+            fallback = fallback_tier(tier)
+            if fallback is None:
+                raise
+            print(f"⚠️ Gemini {tier.name} tier failed ({exc}), falling back to {fallback.name}")
+            FALLBACKS.inc(tier=fallback.name)
+            tier = fallback
+            stream, chunk, fold_upto = await _open_stream_on_tier(session, prompt, tier, profile, deadline)
+        async with aclosing(stream):
+            while chunk is not None:
+                # Totals arrive with the last chunks
+                if chunk.usage_metadata is not None:
+                    usage_metadata = chunk.usage_metadata
+                truncated = truncated or hit_output_limit(chunk)
+                if chunk.text:
+                    if not chunks:
+                        FIRST_TOKEN_SECONDS.observe(time.perf_counter() - requested)
+                    chunks.append(chunk.text)
+                    yield chunk.text
+                chunk = await _next_chunk(stream, deadline)
+        TIER_SECONDS.observe(time.perf_counter() - started, tier=tier.name)
+        usage = record_generation("stream", time.perf_counter() - started, usage_metadata)
+        _record_profile(profile, time.perf_counter() - started, usage, truncated)
+
+    # Append the assembled exchange
+    reply = "".join(chunks)
+    await _record_exchange(session_id, prompt, reply)
+    await session_store.call("add_usage", session_id, usage)
+    _schedule_summary(session_id, session, fold_upto)
+    if first_turn and not truncated:
+        answer_cache.put(session.document_hash, profile.name, prompt, reply)
@@ -0,0 +1,136 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+from google.genai import types
+
+from client import client
+from config import (
+    CONTEXT_CACHE_ENABLED,
+    CONTEXT_CACHE_MAX_ENTRIES,
+    CONTEXT_CACHE_TTL_SECONDS,
+    SYSTEM_PROMPT_VERSION,
+    system_prompt,
+)
+from lru import BoundedLRU
+from singleflight import SingleFlight
+
+
+CacheKey = Tuple[str, str, str]
+
+# Stop handing out a cache this long before the provider would expire it
+_EXPIRY_MARGIN_SECONDS = 30
+
+
+def prefix_contents(document_uri: Optional[str]) -> list:
+    contents = [{"role": "user", "parts": [{"text": system_prompt}]}]
+
+    # Always include document reference
+    if document_uri:
+        contents.append({
+            "role": "user",
+            "parts": [
+                {"file_data": {"file_uri": document_uri}},
+                {"text": "Reference document attached for context."}
+            ]
+        })
+
+    return contents
+
+
+class _Entry:
+    __slots__ = ("name", "expires_at")
+
+    def __init__(self, name: str, expires_at: float):
+        self.name = name
+        self.expires_at = expires_at
+
+
+class ContextCache:
+    """Provider-side cached prefix (system prompt + document), keyed by document hash.
+
+    Caches are created in the background on first use and reused by every turn of
+    every session on the same document. Entries that are still in use are extended
+    before they expire; the least recently used ones are deleted past ``max_entries``.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int, enabled: bool = True):
+        self._ttl = ttl_seconds
+        self._enabled = enabled
+        self._entries: BoundedLRU[CacheKey, _Entry] = BoundedLRU(max_entries)
+        # Creates and refreshes in flight, at most one per key
+        self._pending = SingleFlight()
+        # Keys the provider refused to cache (e.g. below the minimum token count)
+        self._rejected: Dict[CacheKey, float] = {}
+
+    def _now(self) -> float:
+        return time.time()
+
+    def lookup(self, model: str, document_hash: Optional[str], document_uri: Optional[str]) -> Optional[str]:
+        """Return the cache name for this prefix, or None and start creating it."""
+        if not self._enabled or not document_hash or not document_uri:
+            return None
+
+        key = (model, document_hash, SYSTEM_PROMPT_VERSION)
+        now = self._now()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires_at - _EXPIRY_MARGIN_SECONDS > now:
+                if entry.expires_at - now < self._ttl / 4:
+                    self._pending.start(key, lambda: self._refresh(key, entry))
+                return entry.name
+            self._entries.pop(key)
+
+        if self._rejected.get(key, 0) > now:
+            return None
+        self._pending.start(key, lambda: self._create(key, model, document_uri))
+        return None
+
+    async def _create(self, key: CacheKey, model: str, document_uri: str) -> None:
+        try:
+            cached = await client.aio.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    contents=prefix_contents(document_uri),
+                    ttl=f"{self._ttl}s",
+                ),
+            )
+        except Exception as exc:
+            self._rejected[key] = self._now() + self._ttl
+            print(f"⚠️ Context cache not created for {key[1][:12]}: {exc}")
+            return
+
+        self._evict(self._entries.put(key, _Entry(cached.name, self._now() + self._ttl)))
+
+    async def _refresh(self, key: CacheKey, entry: _Entry) -> None:
+        try:
+            await client.aio.caches.update(
+                name=entry.name,
+                config=types.UpdateCachedContentConfig(ttl=f"{self._ttl}s"),
+            )
+        except Exception:
+            # Let it lapse; the next lookup recreates it
+            return
+        entry.expires_at = self._now() + self._ttl
+
+    def _evict(self, evicted: List[Tuple[CacheKey, _Entry]]) -> None:
+        now = self._now()
+        for key in [k for k, until in self._rejected.items() if until <= now]:
+            del self._rejected[key]
+
+        for _, entry in evicted:
+            asyncio.create_task(self._delete(entry.name))
+
+    async def _delete(self, name: str) -> None:
+        try:
+            await client.aio.caches.delete(name=name)
+        except Exception:
+            pass
+
+
+context_cache = ContextCache(
+    ttl_seconds=CONTEXT_CACHE_TTL_SECONDS,
+    max_entries=CONTEXT_CACHE_MAX_ENTRIES,
+    enabled=CONTEXT_CACHE_ENABLED,
+)
@@ -1,6 +1,36 @@
+import asyncio
+import hashlib
+import mimetypes
+import secrets
+import tempfile
+import time
+from typing import Awaitable, BinaryIO, Callable, Dict, Optional, Tuple
+
+from analysis import analysis_store
 from client import client
+from lru import BoundedLRU
+from metrics import UPLOAD_SECONDS, Counter, registry
+from config import DOCUMENT_MAX_BYTES, DOCUMENT_MODE, UPLOAD_CACHE_MAX_ENTRIES, UPLOAD_CACHE_TTL_SECONDS
+from retrieval import build_index, retrieval_store
+from singleflight import SingleFlight, join
 import state
-from sessions import session_store
+from sessions import (
+    DOCUMENT_FAILED,
+    DOCUMENT_PENDING,
+    DOCUMENT_READY,
+    DOCUMENT_UPLOADING,
+    session_store,
+)
+
+
+# Stop reusing a remote file this long before the provider deletes it, so
+# sessions started from the cache still have time to use it
+_PROVIDER_EXPIRY_MARGIN_SECONDS = 2 * 3600
+
+_CHUNK_SIZE = 1024 * 1024
+
+# Documents up to this size stay in memory while waiting for upload
+_SPOOL_MEMORY_BYTES = 4 * 1024 * 1024
 
 
 def upload_document(file_path: str):
@@ -9,8 +39,276 @@ def upload_document(file_path: str):
     print(f"✅ Document uploaded and cached: {state.document_uri}")
 
 
-def upload_document_for_session(session_id: str, file_path: str) -> str:
-    file_obj = client.files.upload(file=file_path)
-    session_store.set_document_uri(session_id, file_obj.uri)
-    session_store.touch(session_id)
-    return file_obj.uri
+def _spool_document(source: BinaryIO) -> Tuple[BinaryIO, str]:
+    # Copy and hash in one pass of bounded chunks; the spool outlives the request
+    spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MEMORY_BYTES)
+    digest = hashlib.sha256()
+    size = 0
+    source.seek(0)
+    for chunk in iter(lambda: source.read(_CHUNK_SIZE), b""):
+        size += len(chunk)
+        if size > DOCUMENT_MAX_BYTES:
+            spool.close()
+            raise ValueError("document_too_large")
+        digest.update(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    return spool, digest.hexdigest()
+
+
+class _Upload:
+    __slots__ = ("uri", "expires_at")
+
+    def __init__(self, uri: str, expires_at: float):
+        self.uri = uri
+        self.expires_at = expires_at
+
+
+class UploadCache:
+    """Remote file URIs keyed by the SHA-256 of the uploaded bytes.
+
+    Entries expire after ``ttl_seconds`` or shortly before the provider's own
+    expiration time, and the least recently used go first past ``max_entries``.
+    Concurrent uploads of the same bytes share a single provider call.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self._ttl = ttl_seconds
+        self._entries: BoundedLRU[str, _Upload] = BoundedLRU(max_entries)
+        self._uploads = SingleFlight()
+
+    def _now(self) -> float:
+        return time.time()
+
+    def get(self, digest: str) -> Optional[str]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        if entry.expires_at <= self._now():
+            self._entries.pop(digest)
+            return None
+        return entry.uri
+
+    async def get_or_upload(self, digest: str, upload: Callable[[], Awaitable]) -> str:
+        uri = self.get(digest)
+        if uri is not None:
+            return uri
+
+        uri, _ = await self._uploads.do(digest, lambda: self._upload(digest, upload))
+        return uri
+
+    async def _upload(self, digest: str, upload: Callable[[], Awaitable]) -> str:
+        started = time.perf_counter()
+        file_obj = await upload()
+        UPLOAD_SECONDS.observe(time.perf_counter() - started)
+
+        expires_at = self._now() + self._ttl
+        expiration_time = getattr(file_obj, "expiration_time", None)
+        if expiration_time is not None:
+            expires_at = min(expires_at, expiration_time.timestamp() - _PROVIDER_EXPIRY_MARGIN_SECONDS)
+
+        self._entries.put(digest, _Upload(file_obj.uri, expires_at))
+        return file_obj.uri
+
+
+upload_cache = UploadCache(ttl_seconds=UPLOAD_CACHE_TTL_SECONDS, max_entries=UPLOAD_CACHE_MAX_ENTRIES)
+
+
+async def _prepare_document(fileobj: BinaryIO, document_hash: str, filename: str, mime_type: Optional[str]) -> str:
+    mime_type = mime_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+    # Built before the upload; the file is still uploaded for analysis and for
+    # workers that do not hold the index
+    if DOCUMENT_MODE == "retrieval" and retrieval_store.get(document_hash) is None:
+        index = await asyncio.to_thread(build_index, fileobj, mime_type)
+        if index is not None:
+            retrieval_store.put(document_hash, index)
+
+    config = {"mime_type": mime_type, "display_name": filename}
+    # The provider reads the buffer directly; nothing is copied to a temp file
+    return await upload_cache.get_or_upload(
+        document_hash, lambda: client.aio.files.upload(file=fileobj, config=config)
+    )
+
+
+async def upload_document_for_session(
+    session_id: str, fileobj: BinaryIO, document_hash: str, filename: str, mime_type: Optional[str] = None
+) -> str:
+    await session_store.call("set_document_state", session_id, DOCUMENT_UPLOADING)
+    uri = await _prepare_document(fileobj, document_hash, filename, mime_type)
+    await session_store.call("set_document_ready", session_id, uri, document_hash)
+    return uri
+
+
+# Ingestion jobs running in this process, by session
+_ingestion_jobs: Dict[str, asyncio.Task] = {}
+
+
+async def start_document_ingestion(
+    session_id: str, source: BinaryIO, filename: str, mime_type: Optional[str] = None
+) -> None:
+    """Take a copy of the upload and ingest it in the background.
+
+    Raises ValueError when the document exceeds DOCUMENT_MAX_BYTES.
+    """
+    spool, document_hash = await asyncio.to_thread(_spool_document, source)
+    await session_store.call("set_document_state", session_id, DOCUMENT_PENDING)
+
+    task = asyncio.create_task(_ingest(session_id, spool, document_hash, filename, mime_type))
+    _ingestion_jobs[session_id] = task
+    task.add_done_callback(lambda _: _ingestion_jobs.pop(session_id, None))
+
+
+async def _ingest(session_id: str, spool: BinaryIO, document_hash: str, filename: str, mime_type: Optional[str]) -> None:
+    try:
+        uri = await upload_document_for_session(session_id, spool, document_hash, filename, mime_type)
+        analysis_store.ensure(session_id, document_hash, uri)
+    except KeyError:
+        # Session ended or expired while uploading
+        pass
+    except Exception as exc:
+        print(f"⚠️ Document ingestion failed for {session_id}: {exc}")
+        try:
+            await session_store.call("set_document_state", session_id, DOCUMENT_FAILED, error="upload_failed")
+        except KeyError:
+            pass
+    finally:
+        spool.close()
+
+
+async def wait_for_document(session_id: str, timeout: float) -> Optional[str]:
+    """Wait up to ``timeout`` seconds for ingestion to settle and return the document state."""
+    job = _ingestion_jobs.get(session_id)
+    if job is not None:
+        try:
+            await asyncio.wait_for(join(job), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return (await session_store.call("status", session_id)).document_state
+
+    # Ingestion may be running in another worker process
+    deadline = time.monotonic() + timeout
+    while True:
+        state = (await session_store.call("status", session_id)).document_state
+        if state not in (DOCUMENT_PENDING, DOCUMENT_UPLOADING) or time.monotonic() >= deadline:
+            return state
+        await asyncio.sleep(0.25)
+
+
+# Documents ingested before any session asked for them, by content hash
+_prewarm_jobs = SingleFlight()
+
+# Random handles given out by prewarm_document, mapped to content hashes. The
+# hash never leaves the server: anyone can compute it from a published proof,
+# so it cannot stand in for having the document
+_handles: BoundedLRU[str, str] = BoundedLRU(UPLOAD_CACHE_MAX_ENTRIES)
+
+
+def _issue_handle(document_hash: str) -> str:
+    handle = secrets.token_urlsafe(24)
+    _handles.put(handle, document_hash)
+    return handle
+
+
+def _resolve_handle(handle: str) -> Optional[str]:
+    # Handles live as long as their document is uploaded or uploading
+    document_hash = _handles.get(handle)
+    if document_hash is None:
+        return None
+    if _prewarm_jobs.get(document_hash) is None and upload_cache.get(document_hash) is None:
+        _handles.pop(handle)
+        return None
+    return document_hash
+
+
+async def prewarm_document(source: BinaryIO, filename: str, mime_type: Optional[str] = None) -> str:
+    """Upload (and index and analyze) a document ahead of its first session.
+
+    Returns a random document handle, which ``attach_prewarmed_document``
+    accepts in place of the file. Raises ValueError when the document exceeds
+    DOCUMENT_MAX_BYTES.
+    """
+    spool, document_hash = await asyncio.to_thread(_spool_document, source)
+    if _prewarm_jobs.get(document_hash) is not None or upload_cache.get(document_hash) is not None:
+        spool.close()
+        return _issue_handle(document_hash)
+
+    _prewarm_jobs.start(document_hash, lambda: _prewarm(spool, document_hash, filename, mime_type))
+    PREWARMED.inc()
+    return _issue_handle(document_hash)
+
+
+async def _prewarm(spool: BinaryIO, document_hash: str, filename: str, mime_type: Optional[str]) -> Optional[str]:
+    try:
+        uri = await _prepare_document(spool, document_hash, filename, mime_type)
+        analysis_store.ensure(None, document_hash, uri)
+        return uri
+    except Exception as exc:
+        print(f"⚠️ Document pre-warm failed for {document_hash[:12]}: {exc}")
+        return None
+    finally:
+        spool.close()
+
+
+def document_handle_state(handle: str) -> Optional[str]:
+    """Ingestion state of a pre-warmed document, or None when this process does not know the handle."""
+    document_hash = _resolve_handle(handle)
+    if document_hash is None:
+        return None
+    if upload_cache.get(document_hash) is not None:
+        return DOCUMENT_READY
+    if _prewarm_jobs.get(document_hash) is not None:
+        return DOCUMENT_PENDING
+    return None
+
+
+async def attach_prewarmed_document(session_id: str, handle: str) -> bool:
+    """Give the session a pre-warmed document instead of an upload.
+
+    Returns False when the handle is unknown here (never issued, expired
+    with the upload cache, or issued by another worker process); the caller
+    should then fall back to sending the file.
+    """
+    document_hash = _resolve_handle(handle)
+    if document_hash is None:
+        HANDLE_STARTS.inc(state="unknown")
+        return False
+
+    uri = upload_cache.get(document_hash)
+    if uri is not None:
+        await session_store.call("set_document_ready", session_id, uri, document_hash)
+        analysis_store.ensure(session_id, document_hash, uri)
+        HANDLE_STARTS.inc(state=DOCUMENT_READY)
+        return True
+
+    job = _prewarm_jobs.get(document_hash)
+    if job is None:
+        HANDLE_STARTS.inc(state="unknown")
+        return False
+
+    await session_store.call("set_document_state", session_id, DOCUMENT_PENDING)
+    task = asyncio.create_task(_attach_when_ready(session_id, document_hash, job))
+    _ingestion_jobs[session_id] = task
+    task.add_done_callback(lambda _: _ingestion_jobs.pop(session_id, None))
+    HANDLE_STARTS.inc(state=DOCUMENT_PENDING)
+    return True
+
+
+async def _attach_when_ready(session_id: str, document_hash: str, job: asyncio.Task) -> None:
+    uri = await join(job)
+    try:
+        if uri is None:
+            await session_store.call("set_document_state", session_id, DOCUMENT_FAILED, error="upload_failed")
+            return
+        await session_store.call("set_document_ready", session_id, uri, document_hash)
+        analysis_store.ensure(session_id, document_hash, uri)
+    except KeyError:
+        # Session ended or expired while the document was uploading
+        pass
+
+
+PREWARMED = registry.register(Counter(
+    "ai_client_prewarmed_documents_total", "Documents ingested ahead of their first session."))
+HANDLE_STARTS = registry.register(Counter(
+    "ai_client_document_handle_starts_total",
+    "Sessions started from a document handle, by the document's state at that moment.", ["state"]))
@@ -0,0 +1,42 @@
+from collections import OrderedDict
+from typing import Generic, Hashable, List, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class BoundedLRU(Generic[K, V]):
+    """Mapping that keeps the ``max_entries`` most recently used entries.
+
+    ``get`` and ``put`` both count as a use. ``put`` returns what it evicted,
+    for callers that must release something held elsewhere.
+    """
+
+    __slots__ = ("_max_entries", "_entries")
+
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[K, V]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._entries
+
+    def get(self, key: K) -> Optional[V]:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: K, value: V) -> List[Tuple[K, V]]:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        evicted = []
+        while len(self._entries) > self._max_entries:
+            evicted.append(self._entries.popitem(last=False))
+        return evicted
+
+    def pop(self, key: K) -> Optional[V]:
+        return self._entries.pop(key, None)
@@ -0,0 +1,103 @@
+import re
+from typing import Optional, Sequence, Tuple
+
+from config import LEGAL_ADVICE_REPLY, OFF_TOPIC_REPLY, PREFILTER_ENABLED, PREFILTER_THRESHOLD
+from metrics import Counter, Gauge, registry
+
+
+OFF_TOPIC = "off_topic"
+LEGAL_ADVICE = "legal_advice"
+
+CANNED_REPLIES = {OFF_TOPIC: OFF_TOPIC_REPLY, LEGAL_ADVICE: LEGAL_ADVICE_REPLY}
+
+# (pattern, points); a category needs PREFILTER_THRESHOLD points
+_Features = Sequence[Tuple["re.Pattern[str]", int]]
+
+# The document as a whole; nearly every legal-advice question names it
+_DOCUMENT_WORDS = r"contract\w*|agreement\w*|sign\w*|document\w*|pdf|file|this"
+# Something specific in the document or the platform
+_SUBJECT_WORDS = (
+    r"claus\w*|terms?|part(y|ies)|section\w*|schedule|appendix|exhibit|annex|obligation\w*|liabilit\w*|"
+    r"indemn\w*|warrant\w*|payment\w*|pay|fees?|invoice\w*|price|renew\w*|terminat\w*|notice|breach\w*|"
+    r"penalt\w*|deadline\w*|expir\w*|effective|confidential\w*|nda|lease|tenant|landlord|employ\w*|salary|"
+    r"governing|jurisdiction|dispute\w*|arbitration|amend\w*|draft|recipient\w*|risk\w*|summar\w*|lock|"
+    r"blockchain|ipfs|wallet|verif\w*|fingerprint|proof|immutab\w*|leave|days?|entitle\w*|rights?|owns?|"
+    r"owner\w*|royalt\w*|licen[cs]\w*|copyright\w*|code|software|deliver\w*|vendor\w*|supplier\w*"
+)
+# Clause references the words above miss: "4.2", "§ 7", "paragraph 3", "article iv"
+_CLAUSE_NUMBER = r"§|\b\d+(\.\d+)+\b|\b(paragraph|article) \(?[\divxlc]+\b"
+
+# Any of these and the prompt is about the document or the platform, whatever else it says
+_DOMAIN = re.compile(rf"\b({_DOCUMENT_WORDS}|{_SUBJECT_WORDS})\b")
+# Any of these and a legal-advice question is about a particular provision, which the model explains
+_SUBJECT = re.compile(rf"\b({_SUBJECT_WORDS})\b|{_CLAUSE_NUMBER}")
+
+_OFF_TOPIC_FEATURES: _Features = (
+    (re.compile(r"\b(recipes?|cook\w*|bake|weather|forecast|jokes?|poems?|lyrics|netflix|football|soccer|"
+                r"cricket|basketball|nba|nfl|horoscope|zodiac|dating|girlfriend|boyfriend|restaurant|homework|"
+                r"meaning of life)\b"), 3),
+    # Also what contracts are about (a film's rights, a song's royalties, holiday
+    # leave), so these need a second signal
+    (re.compile(r"\b(songs?|movies?|films?|vacation|holiday)\b"), 2),
+    (re.compile(r"\b(write|generate|give me|make) (me )?(a |an |some )?(\w+ )?(code|script|program|function|essay|"
+                r"story|poem|song|tweet|cover letter)\b"), 3),
+    (re.compile(r"\b(python|javascript|typescript|java|c\+\+|rust|golang|sql|html|css|react|regex)\b"), 2),
+    (re.compile(r"\b(stack ?overflow|compile\w*|debug\w*)\b"), 1),
+    (re.compile(r"\b(capital of|president of|prime minister|who won|world cup|olympics|population of|"
+                r"how tall is|how old is|stock price|bitcoin price|exchange rate)\b"), 3),
+    (re.compile(r"\b(how old are you|are you (human|real|alive|sentient)|your favou?rite|do you (like|love))\b"), 3),
+    # Bare arithmetic; needs an operator, since a lone "4.2" or "30" is usually a clause or a figure
+    (re.compile(r"^(what is |what's |calculate |solve )?\(?\d[\d.]*\)?( ?[+\-*/x×÷^] ?\(?\d[\d.]*\)?)+( ?=)? ?\??$"), 3),
+    (re.compile(r"\b(translate|recommend (a|some)|tell me about (yourself|the world)|latest news)\b"), 1),
+)
+
+_LEGAL_ADVICE_FEATURES: _Features = (
+    (re.compile(r"\bshould (i|we) (sign|accept|agree to|reject) (this|it|the (contract|agreement|deal|offer))\b|"
+                r"\bshould (i|we) walk away\b"), 3),
+    (re.compile(r"\b(is|are) (this|it|that|these|they)( \w+)? (legal|illegal|lawful|legally binding|"
+                r"valid in court)\b"), 3),
+    # Often a question about what a clause says, which the model should explain
+    (re.compile(r"\b(enforceab\w*|unenforceab\w*)\b"), 1),
+    (re.compile(r"\b(can|could|should) (i|we) (sue|take (them|him|her|it) to court|file a lawsuit)\b"), 3),
+    (re.compile(r"\b(legal advice|do (i|we) need a (lawyer|attorney|solicitor)|will (i|we) win|"
+                r"my legal (rights|options)|legal loophole)\b"), 3),
+    (re.compile(r"\b(lawyer|attorney|solicitor|court|lawsuit|litigation|sue|legally|illegal)\b"), 1),
+    (re.compile(r"\b(should i|what should i do|advise me|your advice)\b"), 1),
+)
+
+
+def _score(features: _Features, text: str) -> int:
+    return sum(points for pattern, points in features if pattern.search(text))
+
+
+def screen_prompt(prompt: str, threshold: int = PREFILTER_THRESHOLD) -> Optional[str]:
+    """Return OFF_TOPIC or LEGAL_ADVICE for clear-cut prompts, or None to ask the model.
+
+    Any contract or platform vocabulary vetoes the off-topic category. Legal
+    advice is only vetoed by a specific subject (a clause, term, party or
+    clause number), since nearly every such question names the contract.
+    """
+    if not PREFILTER_ENABLED:
+        return None
+    normalized = " ".join(prompt.strip().lower().split())
+    if not normalized:
+        return None
+    if not _SUBJECT.search(normalized) and _score(_LEGAL_ADVICE_FEATURES, normalized) >= threshold:
+        return LEGAL_ADVICE
+    if not _DOMAIN.search(normalized) and _score(_OFF_TOPIC_FEATURES, normalized) >= threshold:
+        return OFF_TOPIC
+    return None
+
+
+def _hit_ratio() -> Optional[float]:
+    hits = SCREENED.value(result=OFF_TOPIC) + SCREENED.value(result=LEGAL_ADVICE)
+    total = hits + SCREENED.value(result="model")
+    return hits / total if total else None
+
+
+SCREENED = registry.register(Counter(
+    "ai_client_prefilter_total", "Prompts screened locally, by outcome (off_topic, legal_advice or model).",
+    ["result"]))
+registry.register(Gauge(
+    "ai_client_prefilter_hit_ratio", "Share of screened prompts answered locally without a model call.",
+    function=_hit_ratio))
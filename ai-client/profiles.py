@@ -0,0 +1,90 @@
+from typing import Optional
+
+from google.genai import types
+
+from config import (
+    GEMINI_MAX_OUTPUT_TOKENS,
+    GEMINI_MAX_THINKING_BUDGET,
+    LATENCY_BALANCED_MAX_OUTPUT_TOKENS,
+    LATENCY_BALANCED_TEMPERATURE,
+    LATENCY_BALANCED_THINKING_BUDGET,
+    LATENCY_FAST_MAX_OUTPUT_TOKENS,
+    LATENCY_FAST_TEMPERATURE,
+    LATENCY_FAST_THINKING_BUDGET,
+    LATENCY_PROFILE_DEFAULT,
+    LATENCY_THOROUGH_MAX_OUTPUT_TOKENS,
+    LATENCY_THOROUGH_TEMPERATURE,
+    LATENCY_THOROUGH_THINKING_BUDGET,
+)
+from metrics import Counter, Histogram, registry
+from routing import ModelTier
+
+
+class LatencyProfile:
+    """Thinking, answer length and temperature a message asks for."""
+
+    __slots__ = ("name", "thinking_budget", "max_output_tokens", "temperature")
+
+    def __init__(self, name: str, thinking_budget: int, max_output_tokens: int, temperature: float):
+        self.name = name
+        # A ceiling over the routed tier's budget; -1 adds none
+        self.thinking_budget = thinking_budget
+        self.max_output_tokens = min(max_output_tokens, GEMINI_MAX_OUTPUT_TOKENS)
+        # None keeps the model's default
+        self.temperature = temperature if temperature >= 0 else None
+
+    def thinking_for(self, tier: ModelTier) -> int:
+        # The lowest of the tier's budget, the profile's and the server cap; -1 when none applies
+        budgets = [
+            budget
+            for budget in (tier.thinking_budget, self.thinking_budget, GEMINI_MAX_THINKING_BUDGET)
+            if budget >= 0
+        ]
+        return min(budgets) if budgets else -1
+
+    def apply(self, config: Optional[types.GenerateContentConfig], tier: ModelTier) -> types.GenerateContentConfig:
+        config = config.model_copy() if config is not None else types.GenerateContentConfig()
+        budget = self.thinking_for(tier)
+        max_output_tokens = self.max_output_tokens
+        if budget >= 0:
+            config.thinking_config = types.ThinkingConfig(thinking_budget=budget)
+            # Thoughts count against the output limit, so they must not starve the answer
+            max_output_tokens += budget
+        config.max_output_tokens = max_output_tokens
+        if self.temperature is not None:
+            config.temperature = self.temperature
+        return config
+
+
+PROFILES = {
+    profile.name: profile
+    for profile in (
+        LatencyProfile("fast", LATENCY_FAST_THINKING_BUDGET, LATENCY_FAST_MAX_OUTPUT_TOKENS,
+                       LATENCY_FAST_TEMPERATURE),
+        LatencyProfile("balanced", LATENCY_BALANCED_THINKING_BUDGET, LATENCY_BALANCED_MAX_OUTPUT_TOKENS,
+                       LATENCY_BALANCED_TEMPERATURE),
+        LatencyProfile("thorough", LATENCY_THOROUGH_THINKING_BUDGET, LATENCY_THOROUGH_MAX_OUTPUT_TOKENS,
+                       LATENCY_THOROUGH_TEMPERATURE),
+    )
+}
+DEFAULT_PROFILE = PROFILES.get(LATENCY_PROFILE_DEFAULT, PROFILES["balanced"])
+
+
+def resolve_profile(name: Optional[str]) -> Optional[LatencyProfile]:
+    """The named profile, the default when no name is given, or None for unknown names."""
+    if not name:
+        return DEFAULT_PROFILE
+    return PROFILES.get(name.strip().lower())
+
+
+def hit_output_limit(response) -> bool:
+    candidates = getattr(response, "candidates", None)
+    return bool(candidates) and candidates[0].finish_reason == types.FinishReason.MAX_TOKENS
+
+
+PROFILE_SECONDS = registry.register(Histogram(
+    "ai_client_profile_seconds", "Model-backed message duration per latency profile.", ["profile"]))
+PROFILE_OUTPUT_TOKENS = registry.register(Counter(
+    "ai_client_profile_output_tokens_total", "Output tokens, thoughts included, per latency profile.", ["profile"]))
+PROFILE_TRUNCATED = registry.register(Counter(
+    "ai_client_profile_truncated_total", "Replies cut off at the profile's output limit.", ["profile"]))
@@ -0,0 +1,111 @@
+import math
+from typing import Optional, Tuple
+
+from google.genai import types
+
+from analysis import render_analysis
+from config import (
+    CHARS_PER_TOKEN,
+    CHAT_HISTORY_RECENT_TURNS,
+    CHAT_HISTORY_TOKEN_BUDGET,
+    DOCUMENT_MODE,
+    GEMINI_MODEL,
+    RETRIEVAL_TOP_K,
+)
+from context_cache import context_cache, prefix_contents
+from retrieval import retrieval_store
+from sessions import Session, Turn
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def turn_tokens(turn: Turn) -> int:
+    return estimate_tokens(turn.text)
+
+
+def _select_window(conversation: list, start: int, budget: int) -> Tuple[int, int]:
+    """Return (first kept index, index up to which turns should be folded)."""
+    recent_start = max(start, len(conversation) - CHAT_HISTORY_RECENT_TURNS)
+
+    keep_from = len(conversation)
+    used = 0
+    for index in range(len(conversation) - 1, start - 1, -1):
+        cost = turn_tokens(conversation[index])
+        if index < recent_start and used + cost > budget:
+            break
+        used += cost
+        keep_from = index
+
+    over_budget = keep_from > start or used > budget
+    fold_upto = recent_start if over_budget and recent_start > start else 0
+    return keep_from, fold_upto
+
+
+def _relevant_passages(index, conversation: list, pending_prompt: Optional[str]) -> str:
+    # The previous question helps with follow-ups such as "and for the other party?"
+    query = [pending_prompt or ""]
+    for turn in reversed(conversation):
+        if turn.role == "user":
+            query.append(turn.text)
+            break
+
+    hits = index.search(" ".join(query), RETRIEVAL_TOP_K)
+    if not hits:
+        return ""
+    passages = "\n\n".join(f"[{hit + 1}] {index.chunks[hit]}" for hit in hits)
+    return f"Relevant passages from the reference document:\n{passages}"
+
+
+def build_session_request(session: Session, pending_prompt: Optional[str] = None, model: str = GEMINI_MODEL):
+    """Assemble contents and config for a session turn sent to ``model``.
+
+    Returns ``(contents, config, fold_upto)``; a non-zero ``fold_upto`` means the
+    turns before that index no longer fit the budget and should be summarized.
+    The budget covers the conversation only; the document is billed separately.
+    """
+    index = retrieval_store.get(session.document_hash) if DOCUMENT_MODE == "retrieval" else None
+    if index is not None:
+        # Only the passages relevant to this question, instead of the whole file
+        cache_name = None
+        contents = prefix_contents(None)
+        passages = _relevant_passages(index, session.conversation, pending_prompt)
+        if passages:
+            contents.append({"role": "user", "parts": [{"text": passages}]})
+    else:
+        cache_name = context_cache.lookup(model, session.document_hash, session.document_uri)
+
+        # System prompt and document come from the shared cache when one is ready
+        contents = [] if cache_name else prefix_contents(session.document_uri)
+
+    # Analysis precomputed at ingestion grounds later turns
+    analysis = session.analysis
+    if analysis:
+        contents.append({
+            "role": "user",
+            "parts": [{"text": f"Precomputed analysis of the document:\n{render_analysis(analysis)}"}]
+        })
+
+    summary = session.summary
+    if summary:
+        contents.append({
+            "role": "user",
+            "parts": [{"text": f"Summary of the earlier conversation:\n{summary}"}]
+        })
+
+    conversation = session.conversation
+    budget = CHAT_HISTORY_TOKEN_BUDGET - estimate_tokens(summary) - estimate_tokens(pending_prompt)
+    keep_from, fold_upto = _select_window(conversation, session.summary_turns or 0, budget)
+
+    # Add the conversation window, in the provider's shape
+    contents.extend(turn.to_content() for turn in conversation[keep_from:])
+
+    # Turn not yet recorded in the session
+    if pending_prompt is not None:
+        contents.append({"role": "user", "parts": [{"text": pending_prompt}]})
+
+    config = types.GenerateContentConfig(cached_content=cache_name) if cache_name else None
+    return contents, config, fold_upto
@@ -0,0 +1,131 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, TypeVar
+
+from google.genai import errors
+
+from config import (
+    GEMINI_DEADLINE_SECONDS,
+    GEMINI_MAX_ATTEMPTS,
+    GEMINI_RETRY_BASE_MS,
+    GEMINI_RETRY_MAX_MS,
+)
+from metrics import Counter, registry
+
+
+T = TypeVar("T")
+
+# Rate limits, timeouts and server-side failures; anything else fails at once
+_RETRYABLE_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before any attempt succeeded."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    return isinstance(exc, errors.APIError) and exc.code in _RETRYABLE_CODES
+
+
+class LatencyTracker:
+    """Durations of recent successful calls; quantiles are None until enough are seen."""
+
+    def __init__(self, window: int = 256, min_samples: int = 20):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._min_samples = min_samples
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self._samples) < self._min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[int(q * (len(ordered) - 1))]
+
+
+async def _hedged(call: str, attempt: Callable[[], Awaitable[T]], delay: float,
+                  hedge_when: Callable[[], bool]) -> T:
+    tasks = [asyncio.create_task(attempt())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done and hedge_when():
+            tasks.append(asyncio.create_task(attempt()))
+            HEDGES.inc(call=call)
+
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not tasks[0]:
+                        HEDGE_WINS.inc(call=call)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # The losing copy is cancelled; its tokens, if any, are not reported back
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def call_with_retries(
+    call: str,
+    attempt: Callable[[], Awaitable[T]],
+    deadline_seconds: float = GEMINI_DEADLINE_SECONDS,
+    tracker: Optional[LatencyTracker] = None,
+    hedge_when: Optional[Callable[[], bool]] = None,
+) -> T:
+    """Run ``attempt`` until it succeeds, fails for good or the deadline passes.
+
+    With ``hedge_when`` set, an attempt still running after the tracker's p95
+    latency gets a second copy when ``hedge_when()`` allows it, and the first
+    successful copy wins. Raises DeadlineExceeded when time runs out.
+    """
+    deadline = time.monotonic() + deadline_seconds
+    for number in range(GEMINI_MAX_ATTEMPTS):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+
+        delay = tracker.quantile(0.95) if tracker is not None and hedge_when is not None else None
+        started = time.monotonic()
+        try:
+            if delay is not None:
+                result = await asyncio.wait_for(_hedged(call, attempt, delay, hedge_when), remaining)
+            else:
+                result = await asyncio.wait_for(attempt(), remaining)
+        except asyncio.TimeoutError:
+            break
+        except Exception as exc:
+            if not is_retryable(exc) or number == GEMINI_MAX_ATTEMPTS - 1:
+                raise
+            # Full jitter, so callers failing together do not retry together
+            backoff = random.uniform(0, min(GEMINI_RETRY_MAX_MS, GEMINI_RETRY_BASE_MS * 2 ** number)) / 1000
+            if time.monotonic() + backoff >= deadline:
+                raise
+            RETRIES.inc(call=call)
+            print(f"⚠️ Gemini {call} call failed with {exc.code}, retrying in {backoff:.2f}s")
+            await asyncio.sleep(backoff)
+            continue
+
+        if tracker is not None:
+            tracker.observe(time.monotonic() - started)
+        return result
+
+    DEADLINES_EXCEEDED.inc(call=call)
+    raise DeadlineExceeded(f"{call} call exceeded its {deadline_seconds}s deadline")
+
+
+RETRIES = registry.register(Counter(
+    "ai_client_retries_total", "Model calls retried after a retryable error.", ["call"]))
+HEDGES = registry.register(Counter(
+    "ai_client_hedges_total", "Hedge copies sent for slow model calls.", ["call"]))
+HEDGE_WINS = registry.register(Counter(
+    "ai_client_hedge_wins_total", "Hedge copies that answered before the original.", ["call"]))
+DEADLINES_EXCEEDED = registry.register(Counter(
+    "ai_client_deadlines_exceeded_total", "Model requests that ran out of time.", ["call"]))
@@ -0,0 +1,173 @@
+import math
+import re
+from collections import Counter
+from typing import BinaryIO, List, Optional, Tuple
+
+from config import CHARS_PER_TOKEN, RETRIEVAL_CHUNK_TOKENS, RETRIEVAL_INDEX_MAX_ENTRIES
+from lru import BoundedLRU
+
+
+# Lines that open a new clause: "12.", "4.2", "(a)", "Section 7", "ARTICLE IV"
+_NUMBERED_CLAUSE = re.compile(
+    r"^(\d+(\.\d+)*[.)]?\s|\([a-z0-9]{1,3}\)\s|(section|article|clause|schedule)\s+[\divxlc]+\b)",
+    re.IGNORECASE,
+)
+# Section titles such as "7. TERMINATION", "Article 4 - Payment" or "CONFIDENTIALITY"
+_TOP_LEVEL_CLAUSE = re.compile(r"^(\d+[.)]?\s+\D|(section|article)\s+[\divxlc]+\b)", re.IGNORECASE)
+_ALL_CAPS_HEADING = re.compile(r"^[A-Z][A-Z &,\-]{3,}$")
+_MAX_HEADING_CHARS = 80
+_SENTENCE_END = re.compile(r"(?<=[.;:])\s+")
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have i if in is it its of on or shall that the this to was "
+    "were will with what which who my me we our you your do does can how when where".split()
+)
+# Stripped once, longest first, so "invoices"/"invoice" and "payment"/"pay" meet
+_SUFFIXES = ("ations", "ation", "ality", "ments", "ment", "ities", "ity", "ings", "ing",
+             "ies", "ate", "ed", "es", "al", "s", "e")
+
+
+def extract_text(fileobj: BinaryIO, mime_type: Optional[str]) -> Optional[str]:
+    """Extract plain text locally; None when the type is unsupported.
+
+    PDFs are read with ``pypdf``.
+    """
+    fileobj.seek(0)
+    try:
+        if mime_type == "application/pdf":
+            try:
+                from pypdf import PdfReader
+            except ImportError:
+                print("⚠️ DOCUMENT_MODE=retrieval needs the 'pypdf' package for PDFs")
+                return None
+            reader = PdfReader(fileobj)
+            return "\n".join(page.extract_text() or "" for page in reader.pages)
+        if mime_type and mime_type.startswith("text/"):
+            return fileobj.read().decode("utf-8", errors="replace")
+        return None
+    finally:
+        fileobj.seek(0)
+
+
+def _is_heading(line: str) -> bool:
+    return len(line) <= _MAX_HEADING_CHARS and bool(_TOP_LEVEL_CLAUSE.match(line) or _ALL_CAPS_HEADING.match(line))
+
+
+def split_clauses(text: str, max_tokens: int = RETRIEVAL_CHUNK_TOKENS) -> List[str]:
+    """Split text into clause-sized chunks, each prefixed with its section title.
+
+    Long clauses are cut at sentence boundaries; a title with no clauses under
+    it becomes a chunk of its own.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+
+    clauses: List[Tuple[str, List[str]]] = []
+    section, section_used = "", True
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        if _is_heading(line):
+            if not section_used:
+                clauses.append(("", [section]))
+            section, section_used = line, False
+            continue
+        if not clauses or clauses[-1][0] != section or _NUMBERED_CLAUSE.match(line):
+            clauses.append((section, []))
+        clauses[-1][1].append(line)
+        section_used = True
+    if not section_used:
+        clauses.append(("", [section]))
+
+    chunks: List[str] = []
+    for title, lines in clauses:
+        prefix = f"{title}\n" if title else ""
+        clause = " ".join(lines)
+        if len(prefix) + len(clause) <= max_chars:
+            chunks.append(prefix + clause)
+            continue
+        current = ""
+        for sentence in _SENTENCE_END.split(clause):
+            if current and len(prefix) + len(current) + len(sentence) + 1 > max_chars:
+                chunks.append(prefix + current)
+                current = ""
+            current = f"{current} {sentence}".strip()
+        if current:
+            chunks.append(prefix + current)
+    return chunks
+
+
+def _stem(term: str) -> str:
+    for suffix in _SUFFIXES:
+        if term.endswith(suffix) and len(term) - len(suffix) >= 3:
+            return term[:-len(suffix)]
+    return term
+
+
+def _terms(text: str) -> List[str]:
+    return [_stem(term) for term in _TOKEN.findall(text.lower()) if term not in _STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over a document's chunks."""
+
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self._k1 = k1
+        self._b = b
+        self._frequencies = [Counter(_terms(chunk)) for chunk in chunks]
+        self._lengths = [sum(freq.values()) for freq in self._frequencies]
+        self._average_length = (sum(self._lengths) / len(chunks)) if chunks else 0.0
+
+        document_frequency: Counter = Counter()
+        for freq in self._frequencies:
+            document_frequency.update(freq.keys())
+        total = len(chunks)
+        self._idf = {
+            term: math.log(1 + (total - count + 0.5) / (count + 0.5))
+            for term, count in document_frequency.items()
+        }
+
+    def search(self, query: str, k: int) -> List[int]:
+        """Return the indexes of the best ``k`` chunks, in document order."""
+        terms = [term for term in set(_terms(query)) if term in self._idf]
+        if not terms:
+            return []
+
+        scores = []
+        for index, freq in enumerate(self._frequencies):
+            score = 0.0
+            norm = self._k1 * (1 - self._b + self._b * self._lengths[index] / (self._average_length or 1))
+            for term in terms:
+                count = freq.get(term)
+                if count:
+                    score += self._idf[term] * count * (self._k1 + 1) / (count + norm)
+            if score > 0:
+                scores.append((score, index))
+
+        best = sorted(scores, reverse=True)[:k]
+        return sorted(index for _, index in best)
+
+
+def build_index(fileobj: BinaryIO, mime_type: Optional[str]) -> Optional[BM25Index]:
+    text = extract_text(fileobj, mime_type)
+    chunks = split_clauses(text) if text else []
+    return BM25Index(chunks) if chunks else None
+
+
+class RetrievalIndexStore:
+    """BM25 indexes keyed by document hash, least recently used evicted first."""
+
+    def __init__(self, max_entries: int):
+        self._entries: BoundedLRU[str, BM25Index] = BoundedLRU(max_entries)
+
+    def get(self, document_hash: Optional[str]) -> Optional[BM25Index]:
+        if not document_hash:
+            return None
+        return self._entries.get(document_hash)
+
+    def put(self, document_hash: str, index: BM25Index) -> None:
+        self._entries.put(document_hash, index)
+
+
+retrieval_store = RetrievalIndexStore(max_entries=RETRIEVAL_INDEX_MAX_ENTRIES)
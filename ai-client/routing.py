@@ -0,0 +1,78 @@
+import re
+from typing import Optional
+
+from google.genai import types
+
+from config import (
+    GEMINI_DEEP_MODEL,
+    GEMINI_DEEP_THINKING_BUDGET,
+    GEMINI_FAST_MODEL,
+    GEMINI_FAST_THINKING_BUDGET,
+    MODEL_ROUTING_ENABLED,
+)
+from metrics import Counter, Histogram, registry
+
+
+class ModelTier:
+    """A model and thinking budget that prompts are routed to."""
+
+    __slots__ = ("name", "model", "thinking_budget")
+
+    def __init__(self, name: str, model: str, thinking_budget: int):
+        self.name = name
+        self.model = model
+        # -1 keeps the model's default thinking
+        self.thinking_budget = thinking_budget
+
+    def same_as(self, other: "ModelTier") -> bool:
+        return self.model == other.model and self.thinking_budget == other.thinking_budget
+
+    def apply(self, config: Optional[types.GenerateContentConfig]) -> Optional[types.GenerateContentConfig]:
+        if self.thinking_budget < 0:
+            return config
+        config = config.model_copy() if config is not None else types.GenerateContentConfig()
+        config.thinking_config = types.ThinkingConfig(thinking_budget=self.thinking_budget)
+        return config
+
+
+FAST_TIER = ModelTier("fast", GEMINI_FAST_MODEL, GEMINI_FAST_THINKING_BUDGET)
+DEEP_TIER = ModelTier("deep", GEMINI_DEEP_MODEL, GEMINI_DEEP_THINKING_BUDGET)
+
+# Questions about the document as a whole, or that ask for judgement
+_DEEP_INTENT = re.compile(
+    r"\b(risk\w*|analy[sz]\w*|summar\w*|overview|compare|comparison|implications?|explain|why|"
+    r"negotiat\w*|review|assess\w*|evaluate|fair|unfair|favou?rable|recommend\w*|draft|rewrite|"
+    r"obligations|all (the )?\w+|every|whole|entire|overall|throughout)\b"
+)
+# Point lookups that one clause answers
+_LOOKUP_INTENT = re.compile(
+    r"^(when|who|where|which|how (much|many|long)|what (is|are|was) the|is there|are there|does (it|the)|"
+    r"do (i|we)|can (i|we)|what date)\b|\b(date|expir\w*|deadline|notice period|term length|fee|price|"
+    r"amount|governing law|jurisdiction|renew\w*|signed|effective)\b"
+)
+_MAX_FAST_WORDS = 20
+
+
+def classify_prompt(prompt: str) -> ModelTier:
+    """Send short lookups to the fast tier and everything else to the deep tier."""
+    if not MODEL_ROUTING_ENABLED:
+        return DEEP_TIER
+    normalized = prompt.strip().lower()
+    if len(normalized.split()) > _MAX_FAST_WORDS or _DEEP_INTENT.search(normalized):
+        return DEEP_TIER
+    if _LOOKUP_INTENT.search(normalized):
+        return FAST_TIER
+    return DEEP_TIER
+
+
+def fallback_tier(tier: ModelTier) -> Optional[ModelTier]:
+    other = DEEP_TIER if tier is FAST_TIER else FAST_TIER
+    return None if other.same_as(tier) else other
+
+
+ROUTED = registry.register(Counter(
+    "ai_client_routed_total", "Prompts routed to each model tier.", ["tier"]))
+FALLBACKS = registry.register(Counter(
+    "ai_client_tier_fallbacks_total", "Requests retried on the other tier after a failure.", ["tier"]))
+TIER_SECONDS = registry.register(Histogram(
+    "ai_client_tier_seconds", "Model request duration per tier, retries included.", ["tier"]))
@@ -0,0 +1,148 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque
+
+from config import GEMINI_MAX_CONCURRENCY, GEMINI_MAX_QUEUE, GEMINI_MAX_QUEUE_PER_SESSION
+from metrics import Counter, Gauge, Histogram, registry
+
+
+class QueueFull(Exception):
+    """Raised when a call cannot even wait for a slot; ``retry_after`` is in seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class FairScheduler:
+    """Concurrency cap for model calls with a bounded, per-session round-robin wait queue.
+
+    Each session waits in its own FIFO and freed slots go to the sessions in
+    turn, so one session sending many requests only delays itself. A freed slot
+    passes straight to the next waiter, so newcomers never overtake the queue.
+    """
+
+    def __init__(self, capacity: int, max_queue: int, max_queue_per_session: int):
+        self._capacity = capacity
+        self._max_queue = max_queue
+        self._max_queue_per_session = max_queue_per_session
+        self._active = 0
+        self._waiting = 0
+        # Sessions with waiters, in the order they will be served
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        # Moving average of how long a call holds its slot, for Retry-After
+        self._hold_seconds = 1.0
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def has_idle_slot(self) -> bool:
+        return self._active < self._capacity and not self._waiting
+
+    def retry_after(self) -> int:
+        # Time for the calls ahead to drain through the slots
+        return max(1, math.ceil((self._waiting + 1) / self._capacity * self._hold_seconds))
+
+    def check(self, key: str) -> None:
+        """Raise QueueFull if a call for ``key`` would be turned away right now."""
+        if self.has_idle_slot():
+            return
+        if self._waiting >= self._max_queue:
+            raise QueueFull("queue_full", self.retry_after())
+        queue = self._queues.get(key)
+        if queue is not None and len(queue) >= self._max_queue_per_session:
+            raise QueueFull("session_queue_full", self.retry_after())
+
+    async def acquire(self, key: str) -> None:
+        if self.has_idle_slot():
+            self._active += 1
+            return
+        try:
+            self.check(key)
+        except QueueFull as exc:
+            REJECTED.inc(reason=exc.reason)
+            raise
+
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+        queue.append(future)
+        self._waiting += 1
+        started = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the waiter was cancelled; hand the slot on
+                self.release()
+            else:
+                self._withdraw(key, future)
+            raise
+        finally:
+            WAIT_SECONDS.observe(time.perf_counter() - started)
+
+    def _withdraw(self, key: str, future: asyncio.Future) -> None:
+        queue = self._queues.get(key)
+        if queue is None:
+            return
+        try:
+            queue.remove(future)
+        except ValueError:
+            return
+        self._waiting -= 1
+        if not queue:
+            del self._queues[key]
+
+    def release(self) -> None:
+        while self._queues:
+            key, queue = next(iter(self._queues.items()))
+            future = queue.popleft()
+            self._waiting -= 1
+            # The session goes to the back of the rotation
+            if queue:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            # Skips waiters cancelled before they could withdraw
+            if not future.cancelled():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, key: str) -> AsyncIterator[None]:
+        await self.acquire(key)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * (time.perf_counter() - started)
+            self.release()
+
+
+generation_scheduler = FairScheduler(
+    capacity=GEMINI_MAX_CONCURRENCY,
+    max_queue=GEMINI_MAX_QUEUE,
+    max_queue_per_session=GEMINI_MAX_QUEUE_PER_SESSION,
+)
+
+REJECTED = registry.register(Counter(
+    "ai_client_scheduler_rejected_total", "Model calls turned away because the wait queue was full.", ["reason"]))
+WAIT_SECONDS = registry.register(Histogram(
+    "ai_client_scheduler_wait_seconds", "Time model calls waited for a slot."))
+registry.register(Gauge(
+    "ai_client_scheduler_queue_depth", "Model calls waiting for a slot.",
+    function=lambda: generation_scheduler.waiting))
+registry.register(Gauge(
+    "ai_client_scheduler_active", "Model calls holding a slot.",
+    function=lambda: generation_scheduler.active))
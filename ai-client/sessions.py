@@ -1,7 +1,23 @@
+import asyncio
+import json
+import sqlite3
+import threading
 import time
 import uuid
 import os
-from typing import Dict, Any
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+from config import (
+    SESSION_HIBERNATE_AFTER_SECONDS,
+    SESSION_MAX_CONVERSATION_BYTES,
+    SESSION_MAX_SESSIONS,
+    SESSION_MAX_TURNS,
+    SESSION_SNAPSHOT_DIR,
+)
+from metrics import Counter, Gauge, registry
 
 
 def _resolve_session_ttl_seconds() -> int:
@@ -16,11 +32,94 @@ def _resolve_session_ttl_seconds() -> int:
 
 
 SESSION_TTL_SECONDS = _resolve_session_ttl_seconds()
+SESSION_SWEEP_INTERVAL_SECONDS = max(1, SESSION_TTL_SECONDS // 2)
+
+# memory (single process), sqlite (processes on one host) or redis (several hosts)
+SESSION_BACKEND = (os.getenv("SESSION_BACKEND") or "memory").strip().lower()
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH") or "sessions.db"
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL") or "redis://localhost:6379/0"
+SESSION_REDIS_PREFIX = os.getenv("SESSION_REDIS_PREFIX") or "ai-client:session"
+
+# Document ingestion states reported by /sessions/poll
+DOCUMENT_PENDING = "pending"
+DOCUMENT_UPLOADING = "uploading"
+DOCUMENT_READY = "ready"
+DOCUMENT_FAILED = "failed"
+
+# Per-session fields besides the conversation, with their initial values
+_SESSION_FIELDS: Dict[str, Any] = {
+    "document_uri": None,
+    "document_hash": None,
+    "document_state": None,
+    "document_error": None,
+    "summary": None,
+    "summary_turns": 0,
+    # Oldest turns dropped by the memory store's turn and byte bounds
+    "trimmed_turns": 0,
+    "analysis": None,
+    # Running usage totals, see add_usage
+    "conversation_bytes": 0,
+    "input_tokens": 0,
+    "output_tokens": 0,
+    "cached_tokens": 0,
+    "model_calls": 0,
+    "generation_seconds": 0.0,
+}
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cached_tokens", "model_calls", "generation_seconds")
+
+
+class Turn:
+    """One conversation turn; the provider's content dict is built only when a request is."""
+
+    __slots__ = ("role", "text")
+
+    def __init__(self, role: str, text: str):
+        self.role = role
+        self.text = text
+
+    def to_content(self) -> Dict[str, Any]:
+        return {"role": self.role, "parts": [{"text": self.text}]}
+
+
+class Session:
+    """Session fields as slots, with ``conversation`` a list of Turn records."""
 
+    __slots__ = tuple(_SESSION_FIELDS) + ("conversation", "last_seen", "active")
+
+    def __init__(self, last_seen: float, **fields: Any):
+        for key, default in _SESSION_FIELDS.items():
+            setattr(self, key, fields.get(key, default))
+        self.conversation: List[Turn] = []
+        self.last_seen = last_seen
+        self.active = True
+
+    def update(self, **fields: Any) -> None:
+        for key, value in fields.items():
+            setattr(self, key, value)
+
+    def fields(self) -> Dict[str, Any]:
+        return {key: getattr(self, key) for key in _SESSION_FIELDS}
+
+
+class SessionStore(ABC):
+    """Interface shared by the session backends.
+
+    ``get`` returns a Session record. Backends other than memory return a
+    snapshot, so changes must go through the store's methods.
+
+    Sessions with an open connection (see ``connect``) are kept alive by the
+    sweeper instead of by client heartbeats.
+
+    Async code goes through ``call``, which keeps backends that do disk or
+    network I/O off the event loop.
+    """
+
+    # Set by backends whose methods block on I/O
+    blocking = False
 
-class SessionStore:
     def __init__(self):
-        self._sessions: Dict[str, Dict[str, Any]] = {}
+        # Open connections per session in this process
+        self._connections: Dict[str, int] = {}
 
     def _now(self) -> float:
         return time.time()
@@ -28,60 +127,698 @@ class SessionStore:
     def _ttl(self) -> int:
         return SESSION_TTL_SECONDS
 
-    def _new_session(self) -> Dict[str, Any]:
-        return {
-            "conversation": [],
-            "document_uri": None,
-            "last_seen": self._now(),
-            "active": True,
-        }
+    def _new_session(self) -> Session:
+        return Session(last_seen=self._now())
+
+    async def call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        """Run a store method from async code, in a worker thread for blocking backends."""
+        bound = getattr(self, method)
+        if not self.blocking:
+            return bound(*args, **kwargs)
+        return await asyncio.to_thread(bound, *args, **kwargs)
+
+    @abstractmethod
+    def create(self) -> str:
+        ...
+
+    @abstractmethod
+    def get(self, session_id: str) -> Session:
+        ...
+
+    def status(self, session_id: str) -> Session:
+        """Like ``get``, for callers that read fields but not the conversation,
+        which a backend may then leave unloaded (``conversation`` is None)."""
+        return self.get(session_id)
+
+    @abstractmethod
+    def touch(self, session_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def end(self, session_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def purge_expired(self) -> None:
+        ...
+
+    @abstractmethod
+    def _update(self, session_id: str, **fields: Any) -> None:
+        """Set session fields atomically; raises KeyError for unknown sessions."""
+
+    @abstractmethod
+    def _increment(self, session_id: str, **amounts: float) -> None:
+        """Add to numeric session fields atomically; raises KeyError for unknown sessions."""
+
+    @abstractmethod
+    def _append_turn(self, session_id: str, role: str, text: str) -> None:
+        """Append one turn and count its bytes atomically; raises KeyError for unknown sessions."""
+
+    def stats(self) -> Optional[Dict[str, int]]:
+        """Return ``live_sessions`` and ``conversation_bytes``, or None when the
+        backend has no cheap global view."""
+        return None
+
+    def hibernate_idle(self) -> None:
+        """Move conversations of idle sessions out of process memory; only the
+        memory backend holds them there."""
+        return None
+
+    def hibernate_all(self) -> None:
+        """Snapshot every session before shutdown, so a restart can restore them."""
+        return None
+
+    # Connection counts are only changed on the event loop
+    async def connect(self, session_id: str) -> None:
+        await self.call("touch", session_id)
+        self._connections[session_id] = self._connections.get(session_id, 0) + 1
+
+    async def disconnect(self, session_id: str) -> None:
+        count = self._connections.get(session_id, 0) - 1
+        if count > 0:
+            self._connections[session_id] = count
+        else:
+            self._connections.pop(session_id, None)
+        try:
+            await self.call("touch", session_id)
+        except KeyError:
+            pass
+
+    @property
+    def connected_sessions(self) -> int:
+        return len(self._connections)
+
+    async def touch_connected(self) -> None:
+        # One write per connected session per sweep instead of a poll every few seconds
+        for session_id in list(self._connections):
+            try:
+                await self.call("touch", session_id)
+            except KeyError:
+                self._connections.pop(session_id, None)
+
+    def set_document_uri(self, session_id: str, uri: str) -> None:
+        self._update(session_id, document_uri=uri)
+
+    def set_document_state(self, session_id: str, state: str, error: Optional[str] = None) -> None:
+        self._update(session_id, document_state=state, document_error=error)
+
+    def set_document_ready(self, session_id: str, uri: str, document_hash: str) -> None:
+        self._update(
+            session_id,
+            document_uri=uri,
+            document_hash=document_hash,
+            document_state=DOCUMENT_READY,
+            document_error=None,
+        )
+
+    def set_analysis(self, session_id: str, analysis: Dict[str, Any]) -> None:
+        self._update(session_id, analysis=analysis)
+
+    def append_user_turn(self, session_id: str, text: str) -> None:
+        self._append_turn(session_id, "user", text)
+
+    def append_model_turn(self, session_id: str, text: str) -> None:
+        self._append_turn(session_id, "model", text)
+
+    def set_summary(self, session_id: str, summary: str, summary_turns: int) -> None:
+        self._update(session_id, summary=summary, summary_turns=summary_turns)
+
+    def add_usage(self, session_id: str, usage: Dict[str, float]) -> None:
+        self._increment(session_id, **{key: usage[key] for key in USAGE_FIELDS if usage.get(key)})
+
+
+def session_usage(session: Session) -> Dict[str, float]:
+    return {key: getattr(session, key) or 0 for key in USAGE_FIELDS}
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions in this process, bounded by SESSION_MAX_SESSIONS, SESSION_MAX_TURNS
+    and SESSION_MAX_CONVERSATION_BYTES.
+
+    With ``hibernate_after`` set, sessions nobody has read for that long keep
+    only their fields in memory; the conversation and summary go to a
+    compressed snapshot in ``snapshot_dir`` and are loaded back by ``get``.
+    Touches (polls, open WebSockets) keep a session alive but do not count as
+    use. Snapshots left by a previous process are restored at startup.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = SESSION_MAX_SESSIONS,
+        max_turns: int = SESSION_MAX_TURNS,
+        max_conversation_bytes: int = SESSION_MAX_CONVERSATION_BYTES,
+        hibernate_after: int = SESSION_HIBERNATE_AFTER_SECONDS,
+        snapshot_dir: str = SESSION_SNAPSHOT_DIR,
+    ):
+        super().__init__()
+        # Ordered by last_seen: every session shares one TTL, so touch order is
+        # deadline order and expiry only ever has to look at the front.
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._conversation_bytes = 0
+        self._max_sessions = max_sessions
+        # Whole exchanges are dropped, so a bound of one turn would keep none
+        self._max_turns = max(2, max_turns) if max_turns else 0
+        self._max_conversation_bytes = max_conversation_bytes
+
+        # Sessions still in memory by last use, oldest first, same trick as above
+        self._last_used: "OrderedDict[str, float]" = OrderedDict()
+        self._hibernate_after = hibernate_after
+        self._snapshot_dir = snapshot_dir
+        self._hibernated = 0
+        if hibernate_after:
+            os.makedirs(snapshot_dir, exist_ok=True)
+            self._restore_snapshots()
 
     def create(self) -> str:
+        if self._max_sessions and len(self._sessions) >= self._max_sessions:
+            self.purge_expired()
+            while len(self._sessions) >= self._max_sessions:
+                self._evict(next(iter(self._sessions)), "sessions")
         session_id = str(uuid.uuid4())
         self._sessions[session_id] = self._new_session()
+        self._mark_used(session_id)
         return session_id
 
-    def get(self, session_id: str) -> Dict[str, Any]:
+    def _mark_used(self, session_id: str) -> None:
+        if self._hibernate_after:
+            self._last_used[session_id] = self._now()
+            self._last_used.move_to_end(session_id)
+
+    def _snapshot_path(self, session_id: str) -> str:
+        return os.path.join(self._snapshot_dir, f"{session_id}.snap")
+
+    def _write_snapshot(self, session_id: str, session: Session) -> None:
+        data = {
+            "fields": session.fields(),
+            "conversation": [[turn.role, turn.text] for turn in session.conversation],
+        }
+        path = self._snapshot_path(session_id)
+        # Written aside and renamed, so a crash never leaves half a snapshot
+        with open(path + ".tmp", "wb") as snapshot:
+            snapshot.write(zlib.compress(json.dumps(data).encode("utf-8")))
+        os.replace(path + ".tmp", path)
+
+    def _read_snapshot(self, session_id: str) -> Dict[str, Any]:
+        with open(self._snapshot_path(session_id), "rb") as snapshot:
+            return json.loads(zlib.decompress(snapshot.read()))
+
+    def _remove_snapshot(self, session_id: str) -> None:
+        try:
+            os.remove(self._snapshot_path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def _hibernate(self, session_id: str, session: Session) -> None:
+        self._write_snapshot(session_id, session)
+        self._conversation_bytes -= session.conversation_bytes
+        session.conversation = None
+        session.summary = None
+        self._last_used.pop(session_id, None)
+        self._hibernated += 1
+        SESSIONS_HIBERNATED.inc()
+
+    def _rehydrate(self, session_id: str, session: Session) -> None:
+        try:
+            data = self._read_snapshot(session_id)
+        except (OSError, ValueError, zlib.error) as exc:
+            print(f"⚠️ Session snapshot for {session_id} is unreadable, ending the session: {exc}")
+            self._forget(session_id)
+            raise KeyError("invalid_or_expired_session")
+        # In place, so requests already holding this record see the turns again
+        session.conversation = [Turn(role, text) for role, text in data["conversation"]]
+        session.summary = data["fields"]["summary"]
+        self._remove_snapshot(session_id)
+        self._conversation_bytes += session.conversation_bytes
+        self._hibernated -= 1
+        SESSIONS_REHYDRATED.inc()
+
+    def _restore_snapshots(self) -> None:
+        now = self._now()
+        for name in os.listdir(self._snapshot_dir):
+            if not name.endswith(".snap"):
+                continue
+            session_id = name[:-len(".snap")]
+            try:
+                fields = self._read_snapshot(session_id)["fields"]
+            except (OSError, ValueError, zlib.error) as exc:
+                print(f"⚠️ Skipping unreadable session snapshot {name}: {exc}")
+                self._remove_snapshot(session_id)
+                continue
+            # Downtime does not count against the TTL
+            session = Session(last_seen=now, **fields)
+            session.conversation = None
+            session.summary = None
+            if session.document_state in (DOCUMENT_PENDING, DOCUMENT_UPLOADING):
+                # The ingestion job died with the previous process
+                session.document_state = DOCUMENT_FAILED
+                session.document_error = "ingestion_interrupted"
+            self._sessions[session_id] = session
+            self._hibernated += 1
+        if self._hibernated:
+            print(f"✅ Restored {self._hibernated} sessions from {self._snapshot_dir}")
+
+    def hibernate_idle(self) -> None:
+        if not self._hibernate_after:
+            return
+        cutoff = self._now() - self._hibernate_after
+        while self._last_used:
+            session_id, used = next(iter(self._last_used.items()))
+            if used > cutoff:
+                break
+            self._last_used.popitem(last=False)
+            session = self._sessions.get(session_id)
+            if session is not None and session.conversation is not None:
+                self._hibernate(session_id, session)
+
+    def hibernate_all(self) -> None:
+        if not self._hibernate_after:
+            return
         self.purge_expired()
+        for session_id, session in self._sessions.items():
+            if session.conversation is not None:
+                self._hibernate(session_id, session)
+
+    def _evict(self, session_id: str, reason: str) -> None:
+        self.end(session_id)
+        SESSIONS_EVICTED.inc(reason=reason)
+
+    def _trim(self, session: Session, count: int) -> None:
+        # Drop whole user/model exchanges from the front
+        count = min(len(session.conversation), count + count % 2)
+        size = sum(len(turn.text.encode("utf-8")) for turn in session.conversation[:count])
+        del session.conversation[:count]
+        session.conversation_bytes -= size
+        self._conversation_bytes -= size
+        # Summary indices count from the first turn still held
+        session.summary_turns = max(0, (session.summary_turns or 0) - count)
+        session.trimmed_turns = (session.trimmed_turns or 0) + count
+        TURNS_TRIMMED.inc(count)
+
+    def _enforce_bounds(self, session_id: str, session: Session) -> None:
+        if self._max_turns and len(session.conversation) > self._max_turns:
+            self._trim(session, len(session.conversation) - self._max_turns)
+
+        if not self._max_conversation_bytes:
+            return
+        # A conversation holding at least half the bytes gives up its own oldest turns first
+        while (self._conversation_bytes > self._max_conversation_bytes
+               and session.conversation_bytes * 2 >= self._conversation_bytes
+               and len(session.conversation) > 2):
+            self._trim(session, 2)
+        if self._conversation_bytes > self._max_conversation_bytes:
+            # Oldest first, skipping the session being written to and any with no bytes to free
+            for victim in list(self._sessions):
+                if self._conversation_bytes <= self._max_conversation_bytes:
+                    break
+                other = self._sessions[victim]
+                if victim != session_id and other.conversation is not None and other.conversation_bytes:
+                    self._evict(victim, "bytes")
+        # A single conversation larger than the whole budget keeps its latest exchange
+        while self._conversation_bytes > self._max_conversation_bytes and len(session.conversation) > 2:
+            self._trim(session, 2)
+
+    def _expired(self, session: Session, now: float) -> bool:
+        return now - session.last_seen > self._ttl()
+
+    def status(self, session_id: str) -> Session:
         session = self._sessions.get(session_id)
-        if not session or not session.get("active"):
+        if session and self._expired(session, self._now()):
+            self._forget(session_id)
+            session = None
+        if not session or not session.active:
             raise KeyError("invalid_or_expired_session")
         return session
 
+    def get(self, session_id: str) -> Session:
+        session = self.status(session_id)
+        if session.conversation is None:
+            self._rehydrate(session_id, session)
+        self._mark_used(session_id)
+        return session
+
     def touch(self, session_id: str) -> None:
-        session = self.get(session_id)
-        session["last_seen"] = self._now()
+        session = self.status(session_id)
+        session.last_seen = self._now()
+        self._sessions.move_to_end(session_id)
 
-    def set_document_uri(self, session_id: str, uri: str) -> None:
+    def _update(self, session_id: str, **fields: Any) -> None:
         session = self.get(session_id)
-        session["document_uri"] = uri
+        session.update(**fields)
 
-    def append_user_turn(self, session_id: str, text: str) -> None:
-        session = self.get(session_id)
-        session["conversation"].append({"role": "user", "parts": [{"text": text}]})
+    def _increment(self, session_id: str, **amounts: float) -> None:
+        # Counters live in the fields, so a hibernated session stays on disk
+        session = self.status(session_id)
+        for key, amount in amounts.items():
+            setattr(session, key, (getattr(session, key) or 0) + amount)
 
-    def append_model_turn(self, session_id: str, text: str) -> None:
+    def _append_turn(self, session_id: str, role: str, text: str) -> None:
         session = self.get(session_id)
-        session["conversation"].append({"role": "model", "parts": [{"text": text}]})
+        session.conversation.append(Turn(role, text))
+        size = len(text.encode("utf-8"))
+        session.conversation_bytes += size
+        self._conversation_bytes += size
+        self._enforce_bounds(session_id, session)
+
+    def _forget(self, session_id: str) -> Optional[Session]:
+        session = self._sessions.pop(session_id, None)
+        self._last_used.pop(session_id, None)
+        if session is None:
+            return None
+        if session.conversation is None:
+            self._remove_snapshot(session_id)
+            self._hibernated -= 1
+        else:
+            self._conversation_bytes -= session.conversation_bytes
+        return session
+
+    def stats(self) -> Optional[Dict[str, int]]:
+        return {
+            "live_sessions": len(self._sessions),
+            "conversation_bytes": self._conversation_bytes,
+            "hibernated_sessions": self._hibernated,
+        }
 
     def end(self, session_id: str) -> None:
-        session = self._sessions.get(session_id)
+        session = self._forget(session_id)
         if session:
-            session["active"] = False
-            session["conversation"] = []
-            session["document_uri"] = None
+            # In-flight requests may still hold this record
+            session.update(**_SESSION_FIELDS)
+            session.active = False
+            session.conversation = []
 
     def purge_expired(self) -> None:
         now = self._now()
-        to_delete = []
-        for sid, sess in self._sessions.items():
-            if not sess.get("active"):
-                to_delete.append(sid)
-                continue
-            if now - sess.get("last_seen", 0) > self._ttl():
-                to_delete.append(sid)
-        for sid in to_delete:
-            self._sessions.pop(sid, None)
+        while self._sessions:
+            session_id, sess = next(iter(self._sessions.items()))
+            if not self._expired(sess, now):
+                break
+            self._forget(session_id)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a SQLite database in WAL mode, shared by worker processes on one host.
+
+    Fields live in a JSON column updated with ``json_set`` and turns in their own
+    table, so every write is a single statement or a short IMMEDIATE transaction.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            last_seen REAL NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen);
+        CREATE TABLE IF NOT EXISTS turns (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            text TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS turns_session ON turns (session_id, seq);
+    """
+
+    blocking = True
+
+    def __init__(self, path: str = SESSION_SQLITE_PATH):
+        super().__init__()
+        self._path = path
+        self._local = threading.local()
+        self._db.executescript(self._SCHEMA)
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # One connection per worker thread, like one per worker process; the
+        # busy timeout waits in that thread, never on the event loop
+        db = getattr(self._local, "db", None)
+        if db is None:
+            # Autocommit outside explicit transactions
+            db = sqlite3.connect(self._path, timeout=5.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _cutoff(self) -> float:
+        return self._now() - self._ttl()
+
+    def create(self) -> str:
+        session_id = str(uuid.uuid4())
+        session = self._new_session()
+        self._db.execute(
+            "INSERT INTO sessions (id, last_seen, data) VALUES (?, ?, ?)",
+            (session_id, session.last_seen, json.dumps(session.fields())),
+        )
+        return session_id
+
+    def get(self, session_id: str) -> Session:
+        row = self._db.execute(
+            "SELECT last_seen, data FROM sessions WHERE id = ? AND last_seen >= ?",
+            (session_id, self._cutoff()),
+        ).fetchone()
+        if row is None:
+            raise KeyError("invalid_or_expired_session")
+
+        session = Session(last_seen=row[0], **json.loads(row[1]))
+        session.conversation = [
+            Turn(role, text)
+            for role, text in self._db.execute(
+                "SELECT role, text FROM turns WHERE session_id = ? ORDER BY seq", (session_id,)
+            )
+        ]
+        return session
+
+    def touch(self, session_id: str) -> None:
+        cursor = self._db.execute(
+            "UPDATE sessions SET last_seen = ? WHERE id = ? AND last_seen >= ?",
+            (self._now(), session_id, self._cutoff()),
+        )
+        if cursor.rowcount == 0:
+            raise KeyError("invalid_or_expired_session")
+
+    def _update(self, session_id: str, **fields: Any) -> None:
+        assignments = ", ".join("?, json(?)" for _ in fields)
+        params = []
+        for key, value in fields.items():
+            params.extend([f"$.{key}", json.dumps(value)])
+        cursor = self._db.execute(
+            f"UPDATE sessions SET data = json_set(data, {assignments}) WHERE id = ? AND last_seen >= ?",
+            (*params, session_id, self._cutoff()),
+        )
+        if cursor.rowcount == 0:
+            raise KeyError("invalid_or_expired_session")
+
+    def _increment(self, session_id: str, **amounts: float) -> None:
+        if not amounts:
+            self.get(session_id)
+            return
+        assignments = ", ".join("?, coalesce(json_extract(data, ?), 0) + ?" for _ in amounts)
+        params = []
+        for key, amount in amounts.items():
+            params.extend([f"$.{key}", f"$.{key}", amount])
+        cursor = self._db.execute(
+            f"UPDATE sessions SET data = json_set(data, {assignments}) WHERE id = ? AND last_seen >= ?",
+            (*params, session_id, self._cutoff()),
+        )
+        if cursor.rowcount == 0:
+            raise KeyError("invalid_or_expired_session")
+
+    def _append_turn(self, session_id: str, role: str, text: str) -> None:
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            # Existence check and insert in one statement
+            cursor = self._db.execute(
+                "INSERT INTO turns (session_id, role, text) "
+                "SELECT id, ?, ? FROM sessions WHERE id = ? AND last_seen >= ?",
+                (role, text, session_id, self._cutoff()),
+            )
+            if cursor.rowcount == 0:
+                raise KeyError("invalid_or_expired_session")
+            self._db.execute(
+                "UPDATE sessions SET data = json_set(data, '$.conversation_bytes', "
+                "coalesce(json_extract(data, '$.conversation_bytes'), 0) + ?) WHERE id = ?",
+                (len(text.encode("utf-8")), session_id),
+            )
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def stats(self) -> Optional[Dict[str, int]]:
+        live, conversation_bytes = self._db.execute(
+            "SELECT COUNT(*), coalesce(SUM(json_extract(data, '$.conversation_bytes')), 0) "
+            "FROM sessions WHERE last_seen >= ?",
+            (self._cutoff(),),
+        ).fetchone()
+        return {"live_sessions": live, "conversation_bytes": int(conversation_bytes)}
+
+    def _delete(self, where: str, params: tuple) -> None:
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            self._db.execute(f"DELETE FROM turns WHERE session_id IN (SELECT id FROM sessions WHERE {where})", params)
+            self._db.execute(f"DELETE FROM sessions WHERE {where}", params)
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def end(self, session_id: str) -> None:
+        self._delete("id = ?", (session_id,))
+
+    def purge_expired(self) -> None:
+        self._delete("last_seen < ?", (self._cutoff(),))
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions in any Redis-protocol server, shared across processes and hosts.
+
+    Each session is a hash of JSON-encoded fields plus a list of turns, both
+    carrying the session TTL, so expiry is left to the server. Pass ``client`` to
+    use an existing connection (for example a local fakeredis instance). The
+    client's connection pool is shared by the worker threads ``call`` uses.
+    """
+
+    blocking = True
+
+    def __init__(self, url: str = SESSION_REDIS_URL, prefix: str = SESSION_REDIS_PREFIX, client=None):
+        super().__init__()
+        if client is None:
+            try:
+                import redis
+            except ImportError as exc:
+                raise RuntimeError("SESSION_BACKEND=redis requires the 'redis' package") from exc
+            client = redis.Redis.from_url(url)
+        self._redis = client
+        self._prefix = prefix
+
+    def _keys(self, session_id: str):
+        return f"{self._prefix}:{session_id}", f"{self._prefix}:{session_id}:turns"
+
+    def _ttl_ms(self) -> int:
+        return self._ttl() * 1000
+
+    def create(self) -> str:
+        session_id = str(uuid.uuid4())
+        meta_key, _ = self._keys(session_id)
+        session = self._new_session()
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.hset(meta_key, mapping={key: json.dumps(value) for key, value in session.fields().items()})
+        pipe.pexpire(meta_key, self._ttl_ms())
+        pipe.execute()
+        return session_id
+
+    def get(self, session_id: str) -> Session:
+        meta_key, turns_key = self._keys(session_id)
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.hgetall(meta_key)
+        pipe.lrange(turns_key, 0, -1)
+        pipe.pttl(meta_key)
+        fields, turns, pttl = pipe.execute()
+        if not fields:
+            raise KeyError("invalid_or_expired_session")
+
+        session = Session(
+            last_seen=self._now() - (self._ttl_ms() - max(0, pttl)) / 1000,
+            **{(key.decode() if isinstance(key, bytes) else key): json.loads(value) for key, value in fields.items()},
+        )
+        session.conversation = [Turn(*json.loads(raw)) for raw in turns]
+        return session
+
+    def touch(self, session_id: str) -> None:
+        meta_key, turns_key = self._keys(session_id)
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.pexpire(meta_key, self._ttl_ms())
+        pipe.pexpire(turns_key, self._ttl_ms())
+        alive, _ = pipe.execute()
+        if not alive:
+            raise KeyError("invalid_or_expired_session")
+
+    def _watched(self, session_id: str, write) -> None:
+        # Optimistic transaction: never recreate a session that expired meanwhile
+        meta_key, turns_key = self._keys(session_id)
+
+        def transaction(pipe):
+            pttl = pipe.pttl(meta_key)
+            if pttl is None or pttl < 0:
+                raise KeyError("invalid_or_expired_session")
+            pipe.multi()
+            write(pipe, meta_key, turns_key, pttl)
+
+        self._redis.transaction(transaction, meta_key)
+
+    def _update(self, session_id: str, **fields: Any) -> None:
+        mapping = {key: json.dumps(value) for key, value in fields.items()}
+        self._watched(session_id, lambda pipe, meta_key, turns_key, pttl: pipe.hset(meta_key, mapping=mapping))
+
+    def _increment(self, session_id: str, **amounts: float) -> None:
+        def write(pipe, meta_key, turns_key, pttl):
+            for key, amount in amounts.items():
+                pipe.hincrbyfloat(meta_key, key, amount)
+
+        self._watched(session_id, write)
+
+    def _append_turn(self, session_id: str, role: str, text: str) -> None:
+        def write(pipe, meta_key, turns_key, pttl):
+            pipe.rpush(turns_key, json.dumps([role, text]))
+            pipe.pexpire(turns_key, pttl)
+            pipe.hincrby(meta_key, "conversation_bytes", len(text.encode("utf-8")))
+
+        self._watched(session_id, write)
+
+    def end(self, session_id: str) -> None:
+        self._redis.delete(*self._keys(session_id))
+
+    def purge_expired(self) -> None:
+        # Keys carry their own TTL
+        return None
+
+
+def _create_session_store() -> SessionStore:
+    if SESSION_BACKEND == "sqlite":
+        return SQLiteSessionStore()
+    if SESSION_BACKEND == "redis":
+        return RedisSessionStore()
+    return MemorySessionStore()
+
+
+async def sweep_expired_sessions(store: SessionStore, interval: float = SESSION_SWEEP_INTERVAL_SECONDS) -> None:
+    # Reclaims sessions nobody asks about again; request paths only check their own session
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await store.touch_connected()
+            await store.call("purge_expired")
+            await store.call("hibernate_idle")
+        except Exception as exc:
+            # A locked database or dropped connection must not stop future sweeps
+            print(f"⚠️ Session sweep failed, retrying in {interval}s: {exc!r}")
+
+
+session_store = _create_session_store()
+
+
+def _store_stat(name: str) -> Optional[int]:
+    stats = session_store.stats()
+    return None if stats is None else stats.get(name)
 
 
-session_store = SessionStore()
+registry.register(Gauge(
+    "ai_client_live_sessions", "Sessions held by the session store.",
+    function=lambda: _store_stat("live_sessions")))
+registry.register(Gauge(
+    "ai_client_conversation_bytes", "UTF-8 bytes of conversation turns held by the session store.",
+    function=lambda: _store_stat("conversation_bytes")))
+registry.register(Gauge(
+    "ai_client_hibernated_sessions", "Sessions whose conversation is in an on-disk snapshot.",
+    function=lambda: _store_stat("hibernated_sessions")))
+SESSIONS_HIBERNATED = registry.register(Counter(
+    "ai_client_sessions_hibernated_total", "Idle sessions moved to on-disk snapshots."))
+SESSIONS_REHYDRATED = registry.register(Counter(
+    "ai_client_sessions_rehydrated_total", "Hibernated sessions loaded back on use."))
+SESSIONS_EVICTED = registry.register(Counter(
+    "ai_client_sessions_evicted_total", "Sessions evicted by the memory store's bounds.", ["reason"]))
+TURNS_TRIMMED = registry.register(Counter(
+    "ai_client_turns_trimmed_total", "Oldest conversation turns dropped by the memory store's bounds."))
+registry.register(Gauge(
+    "ai_client_connected_sessions", "Sessions kept alive by an open WebSocket in this process.",
+    function=lambda: session_store.connected_sessions))
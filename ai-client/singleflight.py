@@ -0,0 +1,70 @@
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+
+def request_key(model: str, contents: list, config=None) -> str:
+    """Fingerprint of a fully built generate_content request."""
+    payload = {
+        "model": model,
+        "contents": contents,
+        "config": config.model_dump(mode="json", exclude_none=True) if config is not None else None,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class _Call:
+    __slots__ = ("task", "members")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.members: Set[Hashable] = set()
+
+
+async def join(task: asyncio.Task) -> Any:
+    """Wait for the result of a task other callers may be waiting on too."""
+    # Shielded so a caller going away does not cancel the call for the others
+    return await asyncio.shield(task)
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution.
+
+    ``do`` also reports whether the caller is the first from its ``member``
+    (a session) to join the call, so duplicates of one request can skip
+    recording the result while other sessions sharing the call still do.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def get(self, key: Hashable) -> Optional[asyncio.Task]:
+        call = self._calls.get(key)
+        return call.task if call is not None else None
+
+    def _call(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> _Call:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        return call
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Start ``fn`` in the background unless a call for ``key`` is in flight; returns the shared task."""
+        return self._call(key, fn).task
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]],
+                 member: Optional[Hashable] = None) -> Tuple[Any, bool]:
+        call = self._call(key, fn)
+        first = member not in call.members
+        call.members.add(member)
+        return await join(call.task), first
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+
+generation_flight = SingleFlight()
@@ -3,14 +3,29 @@
  * Handles session-scoped confidential AI chat interactions
  */
 
+type DocumentState = 'pending' | 'uploading' | 'ready' | 'failed';
+
+interface SessionUsage {
+  input_tokens: number;
+  output_tokens: number;
+  cached_tokens: number;
+  model_calls: number;
+  generation_seconds: number;
+}
+
 interface StartSessionResponse {
   session_id: string;
-  document_uri: string;
+  // Null until the document is ingested; poll for document_state
+  document_uri: string | null;
+  document_state: DocumentState;
 }
 
 interface PollResponse {
   active: boolean;
   has_document: boolean;
+  document_state?: DocumentState;
+  document_error?: string | null;
+  usage?: SessionUsage;
 }
 
 interface MessageResponse {